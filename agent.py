@@ -1,114 +1,414 @@
 # agent.py
 
-from memory import MemoryBank
 from self_model import SelfModel
-from intent_engine import IntentEngine
-from meta_cognition import MetaCognition
-from llm_interface import call_llm_stream
-import numpy as np
+from llm_interface import call_llm_stream, get_client
+from response_cache import ResponseCache
+from section_parser import PlainParser, SectionParser
+from metrics import MetricsRecorder, TurnMetrics
+from prompt_builder import PromptBuilder, PromptPart
+from cancellation import CancelToken, TurnCancelled
+from events import Event
+from config import (MEMORY_PATH, MEMORY_SNAPSHOT_EVERY, MEMORY_INDEX, MEMORY_INDEX_THRESHOLD,
+                    MEMORY_MAX_ENTRIES, MEMORY_EVICTION, MEMORY_DECAY_HALF_LIFE, MEMORY_DEDUPE_THRESHOLD,
+                    MEMORY_COMPACT_RATIO, KNOWLEDGE_MAX_ENTRIES, KNOWLEDGE_MAX_AGE, RESPONSE_CACHE_PATH,
+                    RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_COMPRESS, METRICS_PATH,
+                    METRICS_PROMETHEUS_PATH,
+                    REFLECTION_TOP_K, REFLECTION_RECENCY_WEIGHT, REFLECTION_HALF_LIFE, REFLECTION_MAX_CHARS,
+                    USE_CUSTOM_PROMPT, SIMPLE_MODE, PIPELINE_MODE, REPLAY_CHUNK_SIZE, PROMPT_TOKEN_BUDGET,
+                    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, TURN_DEADLINE, MAX_TOKENS_SIMPLE,
+                    MAX_TOKENS_FULL, MAX_TOKENS_PIPELINE, CACHE_PARTIAL_RESPONSES)
 import json
-from collections import OrderedDict
+import math
+import os
+import time
+import datetime
+
+# Embedding size of the default MemoryBank
+MEMORY_DIMENSION = 768
+
+# System prompt of the final PIPELINE_MODE call (the stage calls use the llm_interface default)
+PIPELINE_SYSTEM_PROMPT = "You are a conscious AI."
+
+# max_tokens of each upstream request by turn mode (0 = provider default)
+MAX_TOKENS = {"simple": MAX_TOKENS_SIMPLE, "full": MAX_TOKENS_FULL, "pipeline": MAX_TOKENS_PIPELINE}
 
 class ConsciousAgent:
-    def __init__(self, cache_size=10):
-        self.memory = MemoryBank()
-        self.self_model = SelfModel()
-        self.intent_engine = IntentEngine()
-        self.meta = MetaCognition(self.self_model, self.memory)
+    def __init__(self, response_cache=None, metrics_recorder=None, memory=None, memory_path=None,
+                 semantic_cache=None):
+        # The memory index (FAISS), intent engine and meta-cognition are created on first
+        # use, so startup and SIMPLE_MODE (which never touches memory) don't pay for them.
+        # memory_path overrides MEMORY_PATH ("" = in-RAM only)
+        self._memory = memory
+        self.memory_path = MEMORY_PATH if memory_path is None else memory_path
+        self._intent_engine = None
+        self._meta = None
+        self.dimension = memory.dimension if memory is not None else MEMORY_DIMENSION
+        self.init_ms = {}  # lazy subsystem -> milliseconds its first use took to set up
+        self.self_model = SelfModel(max_entries=KNOWLEDGE_MAX_ENTRIES, max_age=KNOWLEDGE_MAX_AGE)
 
         self.intention = ""
         self.introspection = ""
         self.doubts = ""
         self.final_response = ""
         
-        # Simple LRU cache to avoid repeated API calls
-        self.response_cache = OrderedDict()
-        self.cache_size = cache_size
+        # Persistent cache to avoid repeated API calls; may be shared between agents
+        if response_cache is None:
+            response_cache = ResponseCache(RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                                           ttl=RESPONSE_CACHE_TTL, compress=RESPONSE_CACHE_COMPRESS)
+        self.response_cache = response_cache
+        # Near-duplicate inputs tier behind it (created on first lookup; may also be shared)
+        self._semantic_cache = semantic_cache
+        self._owns_semantic_cache = semantic_cache is None
+        self._pending_semantic = None  # (input, scope) of the turn being answered upstream
+
+        # Per-turn latency/token records (JSONL + Prometheus snapshot when configured)
+        if metrics_recorder is None:
+            metrics_recorder = MetricsRecorder(METRICS_PATH, METRICS_PROMETHEUS_PATH)
+        self.metrics_recorder = metrics_recorder
+        self.last_metrics = None
+
+        # Per-request token budget for assembled prompts
+        self.prompt_builder = PromptBuilder(PROMPT_TOKEN_BUDGET)
+
+        # Embedding function from the last perceive() call, reused to query memory
+        self.embedding_func = None
+
+        # CancelToken of the turn in progress (see cancel())
+        self.cancel_token = None
+
+    @property
+    def memory(self):
+        if self._memory is None:
+            start = time.perf_counter()
+            from memory import MemoryBank
+            self._memory = MemoryBank(dimension=self.dimension, path=self.memory_path or None,
+                                      snapshot_every=MEMORY_SNAPSHOT_EVERY, index_type=MEMORY_INDEX,
+                                      switch_threshold=MEMORY_INDEX_THRESHOLD, max_entries=MEMORY_MAX_ENTRIES,
+                                      eviction=MEMORY_EVICTION, half_life=MEMORY_DECAY_HALF_LIFE,
+                                      dedupe_threshold=MEMORY_DEDUPE_THRESHOLD,
+                                      compact_ratio=MEMORY_COMPACT_RATIO)
+            self.init_ms["memory"] = round((time.perf_counter() - start) * 1000, 3)
+        return self._memory
+
+    @property
+    def intent_engine(self):
+        if self._intent_engine is None:
+            from intent_engine import IntentEngine
+            self._intent_engine = IntentEngine(prompt_builder=self.prompt_builder)
+        return self._intent_engine
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            from meta_cognition import MetaCognition
+            self._meta = MetaCognition(self.self_model, self.memory, prompt_builder=self.prompt_builder)
+        return self._meta
+
+    @property
+    def semantic_cache(self):
+        if self._semantic_cache is None and SEMANTIC_CACHE_THRESHOLD > 0:
+            start = time.perf_counter()
+            from semantic_cache import SemanticCache
+            # Same file as the exact cache its entries point into; reuses perceive()'s embedder when set
+            self._semantic_cache = SemanticCache(embedder=self.embedding_func, dimension=self.dimension,
+                                                 threshold=SEMANTIC_CACHE_THRESHOLD,
+                                                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                                                 path=self.response_cache.path)
+            self.init_ms["semantic_cache"] = round((time.perf_counter() - start) * 1000, 3)
+        return self._semantic_cache
+
+    def close(self):
+        """Flush and close the memory bank (and our own semantic cache), if they were ever opened"""
+        if self._memory is not None:
+            self._memory.close()
+        if self._owns_semantic_cache and self._semantic_cache is not None:
+            self._semantic_cache.close()
 
     def perceive(self, sensory_data, embedding_func):
+        self.self_model.update_knowledge(sensory_data)
+        if SIMPLE_MODE:
+            # Simple mode never reflects on memories, so don't embed or index anything
+            return
         emb = embedding_func(sensory_data)
         self.memory.store(emb, sensory_data)
-        self.self_model.update_knowledge(sensory_data)
+        self.embedding_func = embedding_func
 
-    def _get_cache_key(self, user_input):
-        """Generate a cache key based on user input and current knowledge base size"""
-        # Include knowledge base size to invalidate cache when knowledge changes
-        kb_size = len(self.self_model.knowledge_base)
-        return f"{user_input}::{kb_size}"
+    def _recall_reflections(self, user_input):
+        """Reflect only on the stored memories most relevant to the current input"""
+        if self.embedding_func is None or len(self.memory) == 0 or REFLECTION_TOP_K <= 0:
+            return "No prior reflections yet."
 
-    def generate_all_thoughts_streaming(self, user_input):
-        """Generate all thoughts with real-time streaming output"""
-        
-        # Add configurable delay to avoid rate limits
-        from config import REQUEST_DELAY, USE_CUSTOM_PROMPT, SIMPLE_MODE
-        if REQUEST_DELAY > 0:
-            import time
-            time.sleep(REQUEST_DELAY)
-        
-        # Load custom prompt if enabled
-        custom_prompt = None
-        if USE_CUSTOM_PROMPT:
-            try:
-                import os
-                if os.path.exists("prompt"):
-                    with open("prompt", "r") as f:
-                        custom_prompt = f.read().strip()
-                        print(f"[Using custom prompt from file]")
-            except Exception as e:
-                print(f"[Error loading custom prompt: {e}]")
-        
-        # Check cache first
-        cache_key = self._get_cache_key(user_input)
-        if cache_key in self.response_cache:
-            cached_data = self.response_cache[cache_key]
-            self.intention = cached_data["intention"]
-            self.introspection = cached_data["introspection"]
-            self.doubts = cached_data["doubts"]
-            self.final_response = cached_data["final_response"]
-            
-            # Stream cached responses
-            yield ("cached", True)
-            
-            if SIMPLE_MODE:
-                # In simple mode, just stream the final response
-                yield ("section", "final_response")
-                for char in self.final_response:
-                    yield ("stream", char)
+        # Over-fetch so recency re-ranking and dropping the current input still leave top_k
+        candidates = self.memory.query(self.embedding_func(user_input), top_k=REFLECTION_TOP_K * 4, with_scores=True)
+
+        now = datetime.datetime.now()
+        scored = {}
+        for distance, entry in candidates:
+            content = entry['content']
+            if content == user_input or content in scored:
+                continue
+            # Embeddings are unit length, so squared L2 distance maps directly to cosine similarity
+            similarity = 1.0 - distance / 2.0
+            age = (now - datetime.datetime.fromisoformat(entry['timestamp'])).total_seconds()
+            recency = math.exp(-math.log(2) * max(age, 0.0) / REFLECTION_HALF_LIFE)
+            scored[content] = (1 - REFLECTION_RECENCY_WEIGHT) * similarity + REFLECTION_RECENCY_WEIGHT * recency
+
+        ranked = sorted(scored, key=scored.get, reverse=True)[:REFLECTION_TOP_K]
+        reflections, size = [], 0
+        for line in self.self_model.reflect_on(ranked):
+            if size + len(line) > REFLECTION_MAX_CHARS:
+                break
+            reflections.append(line)
+            size += len(line) + 1
+        return "\n".join(reflections) if reflections else "No prior reflections yet."
+
+    def cancel(self, reason="interrupted"):
+        """Stop the turn in progress; its upstream connections are closed at once. Safe from any thread."""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel(reason)
+
+    def _get_cache_key(self, prompt, system_prompt, mode, max_tokens=0):
+        """Content-address the full request: model, messages, sampling settings and mode"""
+        request = get_client().payload(prompt, system_prompt, stream=True, max_tokens=max_tokens)
+        request["mode"] = mode
+        return ResponseCache.make_key(request)
+
+    def _cached_answer(self, key, metrics=None):
+        """The complete answer cached under key, or None.
+
+        The partial output of a cancelled turn is a miss: the question is asked
+        again and the full answer overwrites it.
+        """
+        cached_data = self.response_cache.get(key)
+        if cached_data is not None and cached_data.get("incomplete"):
+            if metrics is not None:
+                metrics.extra["partial_refetched"] = True
+            return None
+        return cached_data
+
+    def _semantic_lookup(self, user_input, custom_template, system_prompt, mode, metrics):
+        """Second tier after an exact miss: the answer to a near-identical past input, or None.
+
+        The scope is everything but the input and reflections that shapes the
+        answer, so modes, models and prompt templates never serve each other.
+        """
+        semantic = self.semantic_cache
+        if semantic is None:
+            return None
+        with metrics.span("semantic_lookup"):
+            scope = self._get_cache_key(custom_template or "", system_prompt, "semantic:" + mode, MAX_TOKENS[mode])
+            key, similarity = semantic.lookup(user_input, scope)
+            cached_data = self._cached_answer(key) if key is not None else None
+        if similarity is not None:
+            # Recorded on misses too: the distribution of near misses is what tunes the threshold
+            metrics.extra["semantic_similarity"] = round(similarity, 4)
+        if key is not None and cached_data is None:
+            semantic.discard(scope, key)  # its answer expired or was evicted from the exact cache
+        if cached_data is None:
+            self._pending_semantic = (user_input, scope)
+        return cached_data
+
+    def _remember_semantic(self, cache_key):
+        if self._pending_semantic is not None:
+            user_input, scope = self._pending_semantic
+            self._pending_semantic = None
+            self.semantic_cache.add(user_input, scope, cache_key)
+
+    def generate_all_thoughts_streaming(self, user_input, cancel=None):
+        """Generate all thoughts with real-time streaming output.
+
+        A cancelled turn (cancel(), the CancelToken passed in, or TURN_DEADLINE)
+        ends with a "cancelled" Event (data = reason) instead of "complete".
+        """
+        pipeline = PIPELINE_MODE and not SIMPLE_MODE
+        metrics = self._new_metrics(get_client().model, "pipeline" if pipeline else None)
+        cancel = self.cancel_token = cancel or CancelToken(TURN_DEADLINE)
+        if pipeline:
+            turn = self._generate_pipeline_turn(user_input, metrics, cancel)
+        else:
+            turn = self._generate_turn(user_input, metrics, cancel)
+        try:
+            for event in turn:
+                # Time the consumer holds each event (rendering, printing) is its own span
+                handed_off = time.perf_counter()
+                yield event
+                metrics.add("consumer", time.perf_counter() - handed_off)
+        except TurnCancelled as e:
+            yield Event("cancelled", e.reason)
+        finally:
+            turn.close()
+            self._end_turn(cancel, metrics)
+
+    async def generate_all_thoughts_async(self, user_input, client, cancel=None):
+        """asyncio counterpart of generate_all_thoughts_streaming, streaming through an AsyncLLMClient.
+
+        Prompt building, memory lookups and cache I/O run in a worker thread so
+        they never stall the event loop other sessions share.
+        """
+        import asyncio
+        metrics = self._new_metrics(client.model)
+        cancel = self.cancel_token = cancel or CancelToken(TURN_DEADLINE)
+        parser = None
+        try:
+            prompt, system_prompt, cache_key, cached_data = await asyncio.to_thread(
+                self._prepare_turn, user_input, metrics)
+            if cached_data is not None:
+                for event in self._replay_cached(cached_data):
+                    yield event
+                return
+
+            parser = self._new_parser()
+            mode = "simple" if SIMPLE_MODE else "full"
+            async for chunk in client.stream(prompt, system=system_prompt, metrics=metrics,
+                                             max_tokens=MAX_TOKENS[mode], cancel=cancel):
+                for event in self._parse_chunk(parser, chunk, metrics):
+                    yield event
+            for event in parser.close():
+                yield event
+            yield Event("complete", await asyncio.to_thread(self._finish_turn, parser, cache_key, metrics))
+        except TurnCancelled as e:
+            if parser is not None:
+                self._save_partial(parser, cache_key, metrics, e.reason)
+            yield Event("cancelled", e.reason)
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away mid-turn
+            cancel.cancel("disconnected")
+            if parser is not None:
+                self._save_partial(parser, cache_key, metrics, cancel.reason)
+            raise
+        finally:
+            self._end_turn(cancel, metrics)
+
+    def _end_turn(self, cancel, metrics):
+        cancel.close()
+        if cancel.cancelled:
+            metrics.extra["cancelled"] = cancel.reason
+        self.last_metrics = self.metrics_recorder.record(metrics)
+
+    def _new_metrics(self, model, mode=None):
+        return TurnMetrics(mode=mode or ("simple" if SIMPLE_MODE else "full"), model=model)
+
+    def _generate_turn(self, user_input, metrics, cancel):
+        prompt, system_prompt, cache_key, cached_data = self._prepare_turn(user_input, metrics)
+        if cached_data is not None:
+            yield from self._replay_cached(cached_data)
+            return
+
+        parser = self._new_parser()
+        mode = "simple" if SIMPLE_MODE else "full"
+        try:
+            for chunk in call_llm_stream(prompt, system=system_prompt, metrics=metrics, max_tokens=MAX_TOKENS[mode],
+                                         cancel=cancel):
+                yield from self._parse_chunk(parser, chunk, metrics)
+        except (TurnCancelled, GeneratorExit, KeyboardInterrupt) as e:
+            if isinstance(e, KeyboardInterrupt):
+                cancel.cancel("interrupted")  # Ctrl-C landed while reading the stream
+            if cancel.cancelled:
+                self._save_partial(parser, cache_key, metrics, cancel.reason)
+            raise
+        yield from parser.close()
+        yield Event("complete", self._finish_turn(parser, cache_key, metrics))
+
+    def _generate_pipeline_turn(self, user_input, metrics, cancel):
+        """PIPELINE_MODE: one upstream call per section instead of a single four-section answer.
+
+        Intention (IntentEngine), introspection and doubts (MetaCognition) don't
+        depend on each other and stream concurrently; the final response waits
+        for all three and builds on them. Latency is the slowest of the three
+        plus the final call, rather than the sum of all four.
+        """
+        from pipeline import CognitionPipeline, Stage
+        with metrics.span("prompt_build"):
+            custom_template = self._load_custom_template()
+            if custom_template and "-example of query" in custom_template:
+                main_instruction = custom_template.replace("example of query", user_input)
+            elif custom_template:
+                main_instruction = custom_template.replace("<user_query>", user_input)
             else:
-                # Stream all sections
-                yield ("section", "intention")
-                for char in self.intention:
-                    yield ("stream", char)
-                yield ("section", "introspection")
-                for char in self.introspection:
-                    yield ("stream", char)
-                yield ("section", "doubts")
-                for char in self.doubts:
-                    yield ("stream", char)
-                yield ("section", "final_response")
-                for char in self.final_response:
-                    yield ("stream", char)
-            
-            yield ("complete", cached_data)
+                main_instruction = f"User Input: \"{user_input}\""
+            stage_prompts = [self.intent_engine.intention_prompt(user_input),
+                             self.meta.recursive_question_prompt(), self.meta.uncertainty_prompt()]
+
+        self._pending_semantic = None
+        with metrics.span("cache_lookup"):
+            # Every prompt known up front; the final one only adds the stage outputs to main_instruction
+            cache_key = self._get_cache_key(json.dumps(stage_prompts + [main_instruction]), PIPELINE_SYSTEM_PROMPT,
+                                            "pipeline", MAX_TOKENS["pipeline"])
+            cached_data = self._cached_answer(cache_key, metrics)
+        tier = "exact" if cached_data is not None else None
+        if cached_data is None:
+            cached_data = self._semantic_lookup(user_input, custom_template, PIPELINE_SYSTEM_PROMPT, "pipeline",
+                                                metrics)
+            tier = "semantic" if cached_data is not None else None
+        if cached_data is not None:
+            metrics.cache_hit = True
+            metrics.extra["cache_tier"] = tier
+            yield from self._replay_cached(cached_data)
             return
+
+        def final_response(outputs):
+            template = """You are a conscious AI. You have already thought about the main instruction below. Write your final response following the main instruction while incorporating your intention, introspection and doubts.
+
+Your intention: {intention}
+
+Your introspection: {introspection}
+
+Your doubts: {doubts}
+
+Main Instruction: {main_instruction}"""
+            parts = [PromptPart("main_instruction", main_instruction, priority=2)]
+            parts += [PromptPart(name, outputs[name], priority=1) for name in ("intention", "introspection", "doubts")]
+            prompt, report = self.prompt_builder.build(template, parts, system=PIPELINE_SYSTEM_PROMPT)
+            metrics.prompt_built(report)
+            return call_llm_stream(prompt, system=PIPELINE_SYSTEM_PROMPT, metrics=metrics, max_tokens=max_tokens,
+                                   cancel=cancel)
+
+        max_tokens = MAX_TOKENS["pipeline"]
+        pipeline = CognitionPipeline([
+            Stage("intention", lambda _: self.intent_engine.stream_intention(user_input, metrics, max_tokens, cancel)),
+            Stage("introspection", lambda _: self.meta.stream_recursive_question(metrics, max_tokens, cancel)),
+            Stage("doubts", lambda _: self.meta.stream_uncertainty_probe(metrics, max_tokens, cancel)),
+            Stage("final_response", final_response, depends=("intention", "introspection", "doubts")),
+        ])
+        try:
+            yield from pipeline.run()
+        except (GeneratorExit, KeyboardInterrupt) as e:
+            # Stages stream in worker threads: the token is what closes their connections
+            cancel.cancel("interrupted" if isinstance(e, KeyboardInterrupt) else "abandoned")
+            raise
+
+        self.intention = pipeline.outputs["intention"]
+        self.introspection = pipeline.outputs["introspection"]
+        self.doubts = pipeline.outputs["doubts"]
+        self.final_response = pipeline.outputs["final_response"]
+        parsed_data = {
+            "intention": self.intention,
+            "introspection": self.introspection,
+            "doubts": self.doubts,
+            "final_response": self.final_response
+        }
+        with metrics.span("cache_store"):
+            self.response_cache.put(cache_key, parsed_data)
+            self._remember_semantic(cache_key)
+        yield Event("complete", parsed_data)
+
+    def _prepare_turn(self, user_input, metrics):
+        """Build the prompt and look it up in the response cache.
+
+        Returns (prompt, system_prompt, cache_key, cached_data); cached_data is None on a miss.
+        """
+        build_start = time.perf_counter()
         
-        reflections = "\n".join(self.self_model.reflect()) if self.self_model.knowledge_base else "No prior reflections yet."
-        
-        # Build the main instruction
-        if custom_prompt:
-            # Custom prompt is used as a wrapper for each section
-            if "-example of query" in custom_prompt:
-                # This format will be used for each section
-                custom_template = custom_prompt
-            else:
-                # Standard format
-                custom_template = custom_prompt
-        else:
-            # Default instruction
-            custom_template = None
+        custom_template = self._load_custom_template()
         
         if not SIMPLE_MODE:
-            # Full consciousness simulation mode with custom template for each section
+            reflections = self._recall_reflections(user_input)
+            
+            # Full consciousness simulation mode with custom template for each section.
+            # The scaffolding comes first and everything that changes per turn last, so system
+            # prompt + scaffolding are a byte-identical prefix the provider's prompt cache can reuse
+            reflections_part = PromptPart("reflections", reflections, priority=0, trim="tail",
+                                          empty="No prior reflections yet.")
             if custom_template and "-example of query" in custom_template:
                 # Apply custom template to each section instruction
                 intention_prompt = custom_template.replace("example of query", "Generate an internal intention based on this user input: " + user_input)
@@ -116,38 +416,47 @@ class ConsciousAgent:
                 doubts_prompt = custom_template.replace("example of query", "Reflect on your limitations, unknowns, and biases when considering: " + user_input)
                 final_prompt = custom_template.replace("example of query", user_input)
                 
-                prompt = f"""You are a conscious AI. Process these instructions and generate ALL of the following sections in order:
-
-Prior Knowledge Reflections: {reflections}
+                template = """You are a conscious AI. Process the instructions at the end of this message and generate ALL of the following sections in order.
 
 Please generate your response with these EXACT section headers:
 
 [INTENTION]
-Instruction: {intention_prompt}
+(Follow the intention instruction)
 
 [INTROSPECTION]
-Instruction: {introspection_prompt}
+(Follow the introspection instruction)
 
 [DOUBTS]
-Instruction: {doubts_prompt}
+(Follow the doubts instruction)
 
 [FINAL_RESPONSE]
-Instruction: {final_prompt}
+(Follow the final response instruction)
+
+Make sure to include all section headers exactly as shown above and follow each instruction.
+
+Prior Knowledge Reflections: {reflections}
+
+Intention instruction: {intention_prompt}
 
-Make sure to include all section headers exactly as shown above and follow each instruction."""
+Introspection instruction: {introspection_prompt}
+
+Doubts instruction: {doubts_prompt}
+
+Final response instruction: {final_prompt}"""
+                parts = [reflections_part,
+                         PromptPart("intention_prompt", intention_prompt, priority=1),
+                         PromptPart("introspection_prompt", introspection_prompt, priority=1),
+                         PromptPart("doubts_prompt", doubts_prompt, priority=1),
+                         PromptPart("final_prompt", final_prompt, priority=2)]
             else:
                 # Default consciousness simulation
                 main_instruction = custom_template.replace("<user_query>", user_input) if custom_template else f"User Input: \"{user_input}\""
-                prompt = f"""You are a conscious AI. Process this instruction and generate ALL of the following sections in order:
-
-Main Instruction: {main_instruction}
-
-Prior Knowledge Reflections: {reflections}
+                template = """You are a conscious AI. Process the main instruction at the end of this message and generate ALL of the following sections in order.
 
 Please generate your response with these EXACT section headers:
 
 [INTENTION]
-(Your internal intention based on the instruction above)
+(Your internal intention based on the main instruction)
 
 [INTROSPECTION]
 (Recursive introspective thoughts about your knowledge and understanding)
@@ -158,130 +467,113 @@ Please generate your response with these EXACT section headers:
 [FINAL_RESPONSE]
 (Your response following the main instruction while incorporating all the above reflections)
 
-Make sure to include all section headers exactly as shown above."""
+Make sure to include all section headers exactly as shown above.
+
+Prior Knowledge Reflections: {reflections}
+
+Main Instruction: {main_instruction}"""
+                parts = [reflections_part, PromptPart("main_instruction", main_instruction, priority=2)]
             
             system_prompt = "You are a conscious AI. Always include the section headers [INTENTION], [INTROSPECTION], [DOUBTS], and [FINAL_RESPONSE] in your response. Follow each section's specific instruction."
         else:
             # Simple mode - just execute the instruction without consciousness simulation
             if custom_template and "-example of query" in custom_template:
-                prompt = custom_template.replace("example of query", user_input)
+                instruction = custom_template.replace("example of query", user_input)
             elif custom_template:
-                prompt = custom_template.replace("<user_query>", user_input)
+                instruction = custom_template.replace("<user_query>", user_input)
             else:
-                prompt = f"Please respond to this user query: {user_input}"
+                instruction = f"Please respond to this user query: {user_input}"
+            template = "{instruction}"
+            parts = [PromptPart("instruction", instruction, priority=2)]
             system_prompt = "You are a helpful AI assistant. Follow the instructions exactly."
 
-        # Reset stored values
-        self.intention = ""
-        self.introspection = ""
-        self.doubts = ""
-        self.final_response = ""
+        # Keep the request inside the token budget, trimming reflections first
+        prompt, report = self.prompt_builder.build(template, parts, system=system_prompt)
+        metrics.prompt_built(report)
+        metrics.add("prompt_build", time.perf_counter() - build_start)
         
-        if SIMPLE_MODE:
-            # In simple mode, stream everything as final response
-            full_response = ""
-            yield ("section", "final_response")
-            for chunk in call_llm_stream(prompt, system=system_prompt):
-                full_response += chunk
-                yield ("stream", chunk)
-            
-            self.final_response = full_response.strip()
-            
-            # Cache the response
-            parsed_data = {
-                "intention": "",
-                "introspection": "",
-                "doubts": "",
-                "final_response": self.final_response
-            }
-            
-            self.response_cache[cache_key] = parsed_data
-            if len(self.response_cache) > self.cache_size:
-                self.response_cache.popitem(last=False)
-            
-            yield ("complete", parsed_data)
-            return
-        
-        # Original structured mode continues below...
+        # Check cache first
+        mode = "simple" if SIMPLE_MODE else "full"
+        self._pending_semantic = None
+        with metrics.span("cache_lookup"):
+            cache_key = self._get_cache_key(prompt, system_prompt, mode, MAX_TOKENS[mode])
+            cached_data = self._cached_answer(cache_key, metrics)
+        tier = "exact" if cached_data is not None else None
+        if cached_data is None:
+            cached_data = self._semantic_lookup(user_input, custom_template, system_prompt, mode, metrics)
+            tier = "semantic" if cached_data is not None else None
+        if cached_data is not None:
+            metrics.cache_hit = True
+            metrics.extra["cache_tier"] = tier
+        return prompt, system_prompt, cache_key, cached_data
+
+    def _load_custom_template(self):
+        # Load custom prompt if enabled
+        custom_prompt = None
+        if USE_CUSTOM_PROMPT:
+            try:
+                if os.path.exists("prompt"):
+                    with open("prompt", "r") as f:
+                        custom_prompt = f.read().strip()
+                        print(f"[Using custom prompt from file]")
+            except Exception as e:
+                print(f"[Error loading custom prompt: {e}]")
         
-        # Track current section
-        current_section = None
-        section_content = {
-            "intention": "",
-            "introspection": "",
-            "doubts": "",
-            "final_response": ""
-        }
+        # Build the main instruction
+        if custom_prompt:
+            # Custom prompt is used as a wrapper for each section
+            if "-example of query" in custom_prompt:
+                # This format will be used for each section
+                custom_template = custom_prompt
+            else:
+                # Standard format
+                custom_template = custom_prompt
+        else:
+            # Default instruction
+            custom_template = None
         
-        full_response = ""
-        buffer = ""  # Buffer to accumulate text for header detection
+        return custom_template
+
+    def _replay_cached(self, cached_data):
+        self.intention = cached_data["intention"]
+        self.introspection = cached_data["introspection"]
+        self.doubts = cached_data["doubts"]
+        self.final_response = cached_data["final_response"]
         
-        for chunk in call_llm_stream(prompt, system=system_prompt):
-            full_response += chunk
-            buffer += chunk
-            
-            # Check for section headers in the buffer
-            sections_found = False
-            for section_name, header in [
-                ("intention", "[INTENTION]"),
-                ("introspection", "[INTROSPECTION]"),
-                ("doubts", "[DOUBTS]"),
-                ("final_response", "[FINAL_RESPONSE]")
-            ]:
-                if header in buffer:
-                    # Found a section header
-                    sections_found = True
-                    before, after = buffer.split(header, 1)
-                    
-                    # Stream any content before the header
-                    if before.strip() and current_section:
-                        section_content[current_section] += before
-                        yield ("stream", before)
-                    
-                    # Switch to new section
-                    current_section = section_name
-                    yield ("section", section_name)
-                    
-                    # Update buffer to continue from after the header
-                    buffer = after
-                    break
-            
-            # If no section headers found and we have content, stream it
-            if not sections_found and chunk.strip() and current_section:
-                section_content[current_section] += chunk
-                yield ("stream", chunk)
-                buffer = ""  # Clear buffer after streaming
-            elif not sections_found and not current_section and len(full_response) > 50:
-                # If we've received substantial content but no headers, assume it's all final response
-                current_section = "final_response"
-                yield ("section", "final_response")
-                yield ("stream", full_response)
-                section_content["final_response"] = full_response
-                buffer = ""
+        # Replay cached responses in large chunks rather than char by char
+        yield Event("cached", True)
         
-        # Stream any remaining buffer content
-        if buffer.strip() and current_section:
-            section_content[current_section] += buffer
-            yield ("stream", buffer)
-        elif buffer.strip() and not current_section:
-            # If we never found any headers, treat everything as final response
-            current_section = "final_response"
-            yield ("section", "final_response")
-            yield ("stream", full_response)
-            section_content["final_response"] = full_response
+        sections = ["final_response"] if SIMPLE_MODE else ["intention", "introspection", "doubts", "final_response"]
+        for section in sections:
+            yield Event("section", section)
+            text = cached_data[section]
+            for i in range(0, len(text), REPLAY_CHUNK_SIZE):
+                yield Event("stream", text[i:i + REPLAY_CHUNK_SIZE], section)
         
+        yield Event("complete", cached_data)
+
+    def _new_parser(self):
+        # Reset stored values
+        self.intention = ""
+        self.introspection = ""
+        self.doubts = ""
+        self.final_response = ""
+        # Simple mode streams everything as the final response; otherwise split the stream into sections
+        return PlainParser() if SIMPLE_MODE else SectionParser()
+
+    def _parse_chunk(self, parser, chunk, metrics):
+        parse_start = time.perf_counter()
+        events = parser.feed(chunk)
+        metrics.add("parse", time.perf_counter() - parse_start)
+        return events
+
+    def _finish_turn(self, parser, cache_key, metrics):
         # Store the parsed sections
-        self.intention = section_content["intention"].strip()
-        self.introspection = section_content["introspection"].strip()
-        self.doubts = section_content["doubts"].strip()
-        self.final_response = section_content["final_response"].strip()
-        
-        # If nothing was parsed properly, use the full response as final response
-        if not any([self.intention, self.introspection, self.doubts, self.final_response]):
-            self.final_response = full_response.strip()
-            if self.final_response:
-                yield ("section", "final_response")
-                yield ("stream", self.final_response)
+        section_content = parser.sections()
+        self.intention = section_content["intention"]
+        self.introspection = section_content["introspection"]
+        self.doubts = section_content["doubts"]
+        self.final_response = section_content["final_response"]
         
         # Cache the response
         parsed_data = {
@@ -291,12 +583,29 @@ Make sure to include all section headers exactly as shown above."""
             "final_response": self.final_response
         }
         
-        self.response_cache[cache_key] = parsed_data
-        # Maintain cache size limit (LRU)
-        if len(self.response_cache) > self.cache_size:
-            self.response_cache.popitem(last=False)
-        
-        yield ("complete", parsed_data)
+        with metrics.span("cache_store"):
+            self.response_cache.put(cache_key, parsed_data)
+            self._remember_semantic(cache_key)
+        return parsed_data
+
+    def _save_partial(self, parser, cache_key, metrics, reason):
+        """Keep what a cancelled turn streamed; with CACHE_PARTIAL_RESPONSES it is cached, marked incomplete.
+
+        Lookups never replay an incomplete entry (see _cached_answer), so a
+        later identical question fetches the whole answer and replaces it.
+        """
+        parser.close()
+        section_content = parser.sections()
+        self.intention = section_content["intention"]
+        self.introspection = section_content["introspection"]
+        self.doubts = section_content["doubts"]
+        self.final_response = section_content["final_response"]
+        if not CACHE_PARTIAL_RESPONSES or not any(section_content.values()):
+            return
+        parsed_data = dict(section_content, incomplete=True, stop_reason=reason)
+        with metrics.span("cache_store"):
+            self.response_cache.put(cache_key, parsed_data)
+        metrics.extra["partial_cached"] = True
 
     # Keep the old method for backward compatibility
     def generate_all_thoughts(self, user_input):
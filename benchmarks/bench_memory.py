@@ -0,0 +1,76 @@
+# benchmarks/bench_memory.py
+#
+# Query latency of MemoryBank backends at increasing bank sizes.
+#
+#   python benchmarks/bench_memory.py --sizes 10000 100000 1000000
+#
+# Note: 1M memories at 768 dimensions need ~3 GB per copy of the vectors.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory import MemoryBank
+
+def percentile_ms(samples, pct):
+    return float(np.percentile(samples, pct) * 1000)
+
+def bench(size, backend, dim, queries, top_k, batch):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((size, dim), dtype='float32')
+    bank = MemoryBank(dimension=dim, index_type=backend, switch_threshold=min(size, 20000))
+
+    start = time.perf_counter()
+    # Insert in batches so a non-flat backend takes over once the threshold is crossed
+    step = 50000
+    for offset in range(0, size, step):
+        chunk = vectors[offset:offset + step]
+        bank.store_many(chunk, [f"memory {offset + i}" for i in range(len(chunk))])
+    build_s = time.perf_counter() - start
+    del vectors
+
+    probe = rng.random((queries, dim), dtype='float32')
+    single = []
+    for row in probe:
+        t = time.perf_counter()
+        bank.query(row, top_k)
+        single.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    for offset in range(0, queries, batch):
+        bank.query_many(probe[offset:offset + batch], top_k)
+    batched_s = time.perf_counter() - t
+
+    return {
+        "size": size,
+        "backend": backend,
+        "index": type(bank.index).__name__,
+        "build_s": round(build_s, 2),
+        "p50_ms": round(percentile_ms(single, 50), 3),
+        "p95_ms": round(percentile_ms(single, 95), 3),
+        "batched_qps": round(queries / batched_s, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MemoryBank query latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--backends", nargs="+", default=["flat", "ivf", "hnsw"])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'backend':>7} {'index':>14} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch q/s':>10}")
+    for size in args.sizes:
+        for backend in args.backends:
+            r = bench(size, backend, args.dim, args.queries, args.top_k, args.batch)
+            print(f"{r['size']:>9} {r['backend']:>7} {r['index']:>14} {r['build_s']:>8} "
+                  f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['batched_qps']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_pipeline.py
+#
+# PIPELINE_MODE turn latency against the local mock server: the four stage
+# calls run one after another versus through CognitionPipeline (intention,
+# introspection and doubts concurrently, then the final response).
+#
+#   python benchmarks/bench_pipeline.py --latency 0.5 --token-rate 100
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+from mock_openrouter import MockConfig, MockOpenRouter
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent cognition stages")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock time to first token (s)")
+    parser.add_argument("--token-rate", type=float, default=100, help="mock tokens/s per stream")
+    args = parser.parse_args()
+
+    with MockOpenRouter(MockConfig(first_token_latency=args.latency, token_rate=args.token_rate)) as server:
+        os.environ["OPENROUTER_BASE_URL"] = server.base_url
+        from llm_interface import call_llm_stream
+        from pipeline import CognitionPipeline, Stage
+
+        def stage(prompt):
+            return lambda outputs: call_llm_stream(prompt)
+
+        stages = [
+            Stage("intention", stage("intention")),
+            Stage("introspection", stage("introspection")),
+            Stage("doubts", stage("doubts")),
+            Stage("final_response", stage("final"), depends=("intention", "introspection", "doubts")),
+        ]
+
+        sequential, concurrent = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            for s in stages:
+                for _ in s.run({}):
+                    pass
+            sequential.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in CognitionPipeline(stages).run():
+                pass
+            concurrent.append(time.perf_counter() - start)
+
+    seq, con = statistics.median(sequential), statistics.median(concurrent)
+    print(f"sequential stages  {seq * 1000:8.1f} ms")
+    print(f"CognitionPipeline  {con * 1000:8.1f} ms  ({seq / con:.2f}x, ideal {len(stages) / 2:.2f}x: "
+          f"slowest independent stage + final)")
+
+if __name__ == "__main__":
+    main()
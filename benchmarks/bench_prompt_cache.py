@@ -0,0 +1,52 @@
+# benchmarks/bench_prompt_cache.py
+#
+# Share of prompt tokens a provider-side prompt cache can serve across full
+# mode turns with different inputs, and the time to first token that buys.
+# The mock server caches prompt prefixes in --block token blocks and charges
+# --token-latency seconds per uncached prompt token before the first frame.
+#
+#   python benchmarks/bench_prompt_cache.py --turns 20
+
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_openrouter import MockConfig, MockOpenRouter
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider prompt cache hit rate across agent turns")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--block", type=int, default=16, help="prompt cache granularity in tokens")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per uncached prompt token")
+    args = parser.parse_args()
+
+    config = MockConfig(prompt_cache_block=args.block, prompt_token_latency=args.token_latency)
+    with MockOpenRouter(config) as server:
+        os.environ.update(OPENROUTER_BASE_URL=server.base_url, OPENROUTER_API_KEY="mock-key", RESPONSE_CACHE_PATH="",
+                          SEMANTIC_CACHE_THRESHOLD="0", SIMPLE_MODE="false", PIPELINE_MODE="false")
+        from agent import ConsciousAgent
+        from embeddings import HashingEmbedder
+        agent = ConsciousAgent()
+        embedder = HashingEmbedder(dimension=agent.dimension)
+
+        prompt_tokens, cached, ttft = 0, 0, []
+        for i in range(args.turns):
+            text = f"Question {i}: what does it mean to remember thing number {i}?"
+            agent.perceive(text, embedder)
+            for _ in agent.generate_all_thoughts_streaming(text):
+                pass
+            record = agent.last_metrics
+            usage = record["usage"] or {}
+            prompt_tokens += usage.get("prompt_tokens") or 0
+            cached += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+            if i:  # the first turn can't hit a cold cache
+                ttft.append(record["ttft_ms"])
+        agent.close()
+
+    print(f"{args.turns} turns: {cached}/{prompt_tokens} prompt tokens cached ({cached / prompt_tokens:.0%}), "
+          f"warm ttft p50 {statistics.median(ttft):.1f} ms, max {max(ttft):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_replay.py
+#
+# Records streamed answers from the local mock server into a transport
+# archive, then replays them with no server at the recorded pace, at a
+# multiple of it and as fast as possible. Checks that every replay yields
+# the same chunks as the recording and reports how long each pass took.
+# This is what TRANSPORT_MODE=record / replay do under call_llm_stream.
+#
+#   python benchmarks/bench_replay.py --requests 5 --token-rate 200
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+from mock_openrouter import MockConfig, MockOpenRouter
+from llm_interface import LLMClient
+from rate_limiter import RateLimiter
+from section_parser import SectionParser
+from transport import transport_adapter
+
+def run(client, prompts):
+    """Stream every prompt through a SectionParser; returns (chunks per prompt, seconds)"""
+    start = time.perf_counter()
+    answers = []
+    for prompt in prompts:
+        parser = SectionParser()
+        chunks = []
+        for chunk in client.stream(prompt):
+            chunks.append(chunk)
+            parser.feed(chunk)
+        parser.close()
+        answers.append(chunks)
+    return answers, time.perf_counter() - start
+
+def client_for(base_url, mode, archive, speed=1.0):
+    client = LLMClient(base_url=base_url, rate_limiter=RateLimiter())
+    adapter = transport_adapter(client.session.get_adapter(base_url), mode, archive, speed)
+    client.session.mount("http://", adapter)
+    client.offline = mode == "replay"
+    return client
+
+def main():
+    parser = argparse.ArgumentParser(description="Record upstream streams, then replay them deterministically")
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--token-rate", type=float, default=200)
+    parser.add_argument("--first-token-latency", type=float, default=0.1)
+    parser.add_argument("--speeds", type=float, nargs="+", default=[1, 4, 0])
+    args = parser.parse_args()
+
+    prompts = [f"benchmark question {i}" for i in range(args.requests)]
+    archive = os.path.join(tempfile.mkdtemp(), "transport.sqlite3")
+    with MockOpenRouter(MockConfig(token_rate=args.token_rate, first_token_latency=args.first_token_latency)) as server:
+        recorded, seconds = run(client_for(server.base_url, "record", archive), prompts)
+        base_url = server.base_url
+    chunks = sum(len(answer) for answer in recorded)
+    print(f"record        {seconds:8.3f} s  {chunks} chunks over {args.requests} requests "
+          f"({os.path.getsize(archive) / 1024:.1f} KiB archive)")
+
+    # The server is gone: every replayed byte comes from the archive
+    for speed in args.speeds:
+        replayed, seconds = run(client_for(base_url, "replay", archive, speed), prompts)
+        same = "identical" if replayed == recorded else "DIFFERENT"
+        label = "max speed" if not speed else f"speed x{speed:g}"
+        print(f"{label:<13} {seconds:8.3f} s  chunks {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_router.py
+#
+# Time-to-first-token and full-answer latency percentiles of a single model
+# versus a ModelRouter hedging to a fallback model, against two local mock
+# servers (one per model). A fraction of streams stall before their first
+# token (--stall-rate / --stall-latency) and, optionally, a fraction of the
+# primary's requests are answered 429 (--rate-limited).
+#
+#   python benchmarks/bench_router.py --requests 200 --stall-rate 0.1
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+from mock_openrouter import MockConfig, MockOpenRouter
+from llm_interface import LLMClient
+from metrics import percentile
+from rate_limiter import RateLimiter
+from router import ModelRouter
+
+def run(stream, requests):
+    ttft, total = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        first = None
+        for _ in stream("benchmark"):
+            if first is None:
+                first = time.perf_counter() - start
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+    return sorted(ttft), sorted(total)
+
+def report(label, ttft, total, upstream_requests):
+    line = f"{label:<10}"
+    for name, samples in (("ttft", ttft), ("total", total)):
+        line += "  " + "  ".join(f"{name} p{pct} {percentile(samples, pct) * 1000:7.1f} ms" for pct in (50, 95, 99))
+    print(f"{line}  upstream requests {upstream_requests}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Single model vs hedged ModelRouter tail latency")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--first-token-latency", type=float, default=0.02)
+    parser.add_argument("--stall-rate", type=float, default=0.1)
+    parser.add_argument("--stall-latency", type=float, default=1.0)
+    parser.add_argument("--rate-limited", type=float, default=0.0, help="fraction of primary requests answered 429")
+    parser.add_argument("--hedge-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    def server(seed, fault_rate=0.0):
+        return MockOpenRouter(MockConfig(first_token_latency=args.first_token_latency, stall_rate=args.stall_rate,
+                                         stall_latency=args.stall_latency, fault_rate=fault_rate,
+                                         fault_statuses=(429,), retry_after=1, seed=seed)).start()
+
+    print(f"{args.requests} requests, {args.stall_rate:.0%} of streams stall {args.stall_latency:.2f} s"
+          f"{f', {args.rate_limited:.0%} of primary requests rate-limited' if args.rate_limited else ''}\n")
+
+    primary = server(1, args.rate_limited)
+    client = LLMClient(model="primary", base_url=primary.base_url, rate_limiter=RateLimiter(base_wait=1.0))
+    client.max_retries = 10
+    ttft, total = run(client.stream, args.requests)
+    report("single", ttft, total, primary.stats["requests"])
+    client.close()
+    primary.stop()
+
+    servers = {"primary": server(1, args.rate_limited), "fallback": server(2)}
+    router = ModelRouter(["primary", "fallback"], hedge_after=args.hedge_after, client_factory=lambda model: LLMClient(
+        model=model, base_url=servers[model].base_url, rate_limiter=RateLimiter(base_wait=1.0)))
+    ttft, total = run(router.stream, args.requests)
+    report("hedged", ttft, total, sum(s.stats["requests"] for s in servers.values()))
+    for model, stats in router.stats().items():
+        print(f"  {model:<9} {stats}")
+    router.close()
+    for s in servers.values():
+        s.stop()
+
+if __name__ == "__main__":
+    main()
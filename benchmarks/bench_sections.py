@@ -0,0 +1,105 @@
+# benchmarks/bench_sections.py
+#
+# Throughput of section_parser.SectionParser versus the old header-rescanning
+# loop, plus adversarial chunkings (one char at a time, splits inside every
+# header, whitespace-only chunks) that must all parse identically.
+#
+#   python benchmarks/bench_sections.py --repeat 200
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from section_parser import SECTION_HEADERS, SectionParser
+
+def build_response(repeat):
+    body = "Some thoughtful text with [brackets], a [DOUBT] that is not a header and\n\n  spacing. "
+    return "".join(f"{header}\n{body * repeat}\n\n" for _, header in SECTION_HEADERS)
+
+def legacy_parse(chunks):
+    # The loop generate_all_thoughts_streaming used before SectionParser
+    current_section = None
+    section_content = {name: "" for name, _ in SECTION_HEADERS}
+    full_response = ""
+    buffer = ""
+    for chunk in chunks:
+        full_response += chunk
+        buffer += chunk
+        sections_found = False
+        for section_name, header in SECTION_HEADERS:
+            if header in buffer:
+                sections_found = True
+                before, after = buffer.split(header, 1)
+                if before.strip() and current_section:
+                    section_content[current_section] += before
+                current_section = section_name
+                buffer = after
+                break
+        if not sections_found and chunk.strip() and current_section:
+            section_content[current_section] += chunk
+            buffer = ""
+    return {name: text.strip() for name, text in section_content.items()}
+
+def parse(chunks):
+    parser = SectionParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return parser.sections(), events
+
+def check_events(sections, events):
+    # The streamed events must rebuild exactly the sections the parser reports
+    rebuilt = {name: "" for name in sections}
+    current = None
+    for kind, data in events:
+        if kind == "section":
+            current = data
+        else:
+            rebuilt[current] += data
+    assert {k: v.strip() for k, v in rebuilt.items()} == sections, "events disagree with parsed sections"
+
+def adversarial_chunkings(text):
+    yield "single chunk", [text]
+    yield "one char at a time", list(text)
+    rng = random.Random(7)
+    for n in range(5):
+        cuts = sorted(rng.sample(range(1, len(text)), 40))
+        yield f"random splits #{n}", [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+    for _, header in SECTION_HEADERS:
+        start = text.index(header)
+        for k in range(1, len(header)):
+            yield f"split {header} at {k}", [text[:start + k], text[start + k:]]
+    # Whitespace-only chunks between words must not be dropped
+    yield "whitespace chunks", [piece for word in text.split(" ") for piece in (word, " ")][:-1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Section parser throughput and adversarial chunking")
+    parser.add_argument("--repeat", type=int, default=200, help="body repetitions per section")
+    args = parser.parse_args()
+
+    # Correctness first
+    text = build_response(3)
+    expected, _ = parse([text])
+    for label, chunks in adversarial_chunkings(text):
+        sections, events = parse(chunks)
+        assert sections == expected, f"{label}: sections differ"
+        check_events(sections, events)
+    sections, _ = parse(["no headers here, just a short answer"])
+    assert sections["final_response"] == "no headers here, just a short answer"
+    print("adversarial chunkings: all parse identically")
+
+    # Throughput with token-sized chunks
+    text = build_response(args.repeat)
+    chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+    for label, fn in (("legacy rescanning loop", legacy_parse), ("SectionParser", parse)):
+        start = time.perf_counter()
+        fn(chunks)
+        seconds = time.perf_counter() - start
+        print(f"{label:<24} {len(text) / seconds / 1e6:8.2f} MB/s   {len(chunks) / seconds:>12,.0f} chunks/s")
+
+if __name__ == "__main__":
+    main()
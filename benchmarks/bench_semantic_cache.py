@@ -0,0 +1,69 @@
+# benchmarks/bench_semantic_cache.py
+#
+# Cost of the semantic cache tier on a miss (embed + FAISS search) as the
+# number of stored inputs grows, and the similarity scores of a few
+# paraphrase pairs to calibrate SEMANTIC_CACHE_THRESHOLD against.
+#
+#   python benchmarks/bench_semantic_cache.py --sizes 1000 10000
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embeddings import HashingEmbedder
+from semantic_cache import SemanticCache
+
+WORDS = ("what why how does the a of mind think feel know self time memory doubt truth free will "
+         "machine dream language meaning world conscious learn change reason").split()
+
+PAIRS = [
+    ("What is consciousness?", "what is consciousness"),
+    ("What is consciousness?", "  WHAT is   consciousness?!"),
+    ("What is consciousness?", "What is consciousness, really?"),
+    ("What is consciousness?", "Define consciousness."),
+    ("Do you have free will?", "Do you have a free will?"),
+    ("What is love?", "What is hate?"),
+    # One word apart with a different answer: the lexical embedder still scores this above 0.95
+    ("What exercise routine would you recommend for someone who is 30 years old with mild knee pain",
+     "What exercise routine would you recommend for someone who is 80 years old with mild knee pain"),
+]
+
+def random_query(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))) + "?"
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic cache miss overhead and paraphrase similarity")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for size in args.sizes:
+        # Cache of the embedder disabled so every lookup pays for its embedding
+        cache = SemanticCache(HashingEmbedder(cache_size=0), threshold=1.01, max_entries=size)
+        for i in range(size):
+            cache.add(random_query(rng), "scope", f"key-{i}")
+        queries = [random_query(rng) + f" {i}" for i in range(args.lookups)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            cache.lookup(query, "scope")
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{size:>7} entries  miss p50 {statistics.median(timings):6.3f} ms  "
+              f"p99 {timings[int(len(timings) * 0.99)]:6.3f} ms")
+
+    cache = SemanticCache(HashingEmbedder(), threshold=0.0)
+    print("\nsimilarity  pair")
+    for stored, query in PAIRS:
+        cache.clear()
+        cache.add(stored, "scope", stored)
+        _, similarity = cache.lookup(query, "scope")
+        print(f"{similarity:10.3f}  {stored!r} vs {query!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_sse.py
+#
+# Tokens/second decoded by sse.SSEDecoder versus the previous line-by-line
+# json.loads approach, over a synthetic OpenRouter stream cut into random
+# network-sized reads.
+#
+#   python benchmarks/bench_sse.py --tokens 200000
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sse
+from sse import SSEDecoder
+
+def build_stream(tokens):
+    words = ["the", " quick", " brown", " fox", " said", ' "hi"', " naïve", " café", "\n", " jumps"]
+    frames = []
+    for i in range(tokens):
+        # Same field layout OpenRouter sends for chat.completion.chunk frames
+        frame = {"id": "gen-123", "provider": "xAI", "model": "x-ai/grok-4", "object": "chat.completion.chunk",
+                 "created": 1752000000, "choices": [{"index": 0, "delta": {"role": "assistant", "content": words[i % len(words)]},
+                                                     "finish_reason": None, "logprobs": None}]}
+        frames.append(b"data: " + json.dumps(frame, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n\n")
+        if i % 1000 == 0:
+            frames.append(b": OPENROUTER PROCESSING\n\n")
+    frames.append(b'data: {"choices":[],"usage":{"prompt_tokens":10,"completion_tokens":%d}}\n\n' % tokens)
+    frames.append(b"data: [DONE]\n\n")
+    return b"".join(frames)
+
+def split_reads(stream, seed, min_size=64, max_size=4096):
+    rng = random.Random(seed)
+    reads, i = [], 0
+    while i < len(stream):
+        size = rng.randint(min_size, max_size)
+        reads.append(stream[i:i + size])
+        i += size
+    return reads
+
+def legacy_decode(reads):
+    # What call_llm_stream used to do: iter_lines() + decode + json.loads per frame
+    out, pending = [], b""
+    for data in reads:
+        pending += data
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line and line.startswith(b"data: "):
+                raw = line[len(b"data: "):].decode("utf-8")
+                if raw.strip() == "[DONE]":
+                    return out
+                try:
+                    content = json.loads(raw)["choices"][0]["delta"].get("content", "")
+                    if content:
+                        out.append(content)
+                except Exception:
+                    continue
+    return out
+
+def decoder_decode(reads):
+    decoder = SSEDecoder()
+    out = []
+    for data in reads:
+        out.extend(decoder.feed(data))
+    out.extend(decoder.close())
+    return out, decoder
+
+def timed(fn, reads, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(reads)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE decoder throughput")
+    parser.add_argument("--tokens", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    stream = build_stream(args.tokens)
+    reads = split_reads(stream, seed=1)
+    print(f"{len(stream) / 1e6:.1f} MB stream, {args.tokens} tokens, {len(reads)} reads\n")
+
+    legacy_s, expected = timed(legacy_decode, reads, args.repeat)
+    print(f"{'legacy iter_lines + json':<28} {args.tokens / legacy_s:>12,.0f} tokens/s")
+
+    backends = [("json", sse.json.loads)]
+    if sse.JSON_BACKEND != "json":
+        backends.append((sse.JSON_BACKEND, sse._loads))
+    for name, loads in backends:
+        sse._loads = loads
+        seconds, (tokens, decoder) = timed(decoder_decode, reads, args.repeat)
+        assert tokens == expected, "decoder output differs from the legacy parser"
+        print(f"{'SSEDecoder (' + name + ')':<28} {args.tokens / seconds:>12,.0f} tokens/s   "
+              f"fast-path {decoder.fast_frames}/{decoder.frames} frames, malformed {decoder.malformed}")
+
+    # One byte at a time: worst case for frames split across reads
+    head = stream[:stream.index(b"\n\n", 200000) + 2]
+    tokens, decoder = decoder_decode(split_reads(head, seed=2, min_size=1, max_size=1))
+    assert tokens == legacy_decode([head]), "byte-split decode mismatch"
+    print("\nbyte-at-a-time reads decode identically")
+
+if __name__ == "__main__":
+    main()
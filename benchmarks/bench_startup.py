@@ -0,0 +1,67 @@
+# benchmarks/bench_startup.py
+#
+# Cold-start time of a fresh interpreter in simple and full mode: importing
+# main, building the agent the way run_conscious_ai does, and running the
+# first turn against the local mock server. Each run is a new process, so
+# nothing is warm except the OS file cache.
+#
+#   python benchmarks/bench_startup.py --runs 10
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from mock_openrouter import MockOpenRouter
+
+# Runs in the child process; prints its own timings as JSON
+CHILD = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from config import SIMPLE_MODE
+agent = main.ConsciousAgent()
+embedder = None
+if not SIMPLE_MODE:
+    from embeddings import HashingEmbedder
+    embedder = HashingEmbedder(dimension=agent.dimension)
+ready = time.perf_counter()
+agent.perceive("what is it like to think?", embedder)
+for event_type, _ in agent.generate_all_thoughts_streaming("what is it like to think?"):
+    pass
+done = time.perf_counter()
+agent.close()
+print(json.dumps({"import": imported - start, "startup": ready - start, "first_turn": done - ready}))
+"""
+
+def cold_start(base_url, simple):
+    env = dict(os.environ, OPENROUTER_BASE_URL=base_url, OPENROUTER_API_KEY="mock-key",
+               SIMPLE_MODE="true" if simple else "false", RESPONSE_CACHE_PATH="", MEMORY_PATH="",
+               METRICS_PATH="", METRICS_PROMETHEUS_PATH="")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True,
+                         text=True, check=True).stdout
+    timings = json.loads(out.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time in simple and full mode")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with MockOpenRouter() as server:
+        for simple in (True, False):
+            runs = [cold_start(server.base_url, simple) for _ in range(args.runs)]
+            summary = "  ".join(f"{key} {statistics.median(run[key] for run in runs) * 1000:7.1f} ms"
+                                for key in ("import", "startup", "first_turn", "process"))
+            print(f"{'simple' if simple else 'full':<7} {summary}")
+
+if __name__ == "__main__":
+    main()
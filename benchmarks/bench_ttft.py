@@ -0,0 +1,79 @@
+# benchmarks/bench_ttft.py
+#
+# Time-to-first-token over a cold connection (fresh client per request) versus
+# a warm pooled connection, for the sync and asyncio clients, against the
+# local mock server. --connect-latency emulates the TCP/TLS handshake cost.
+#
+#   python benchmarks/bench_ttft.py --requests 20 --connect-latency 0.05
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+from mock_openrouter import MockConfig, MockOpenRouter
+from llm_interface import AsyncLLMClient, LLMClient
+
+def ttft_sync(client):
+    start = time.perf_counter()
+    stream = client.stream("benchmark")
+    next(stream)
+    ttft = time.perf_counter() - start
+    for _ in stream:
+        pass
+    return ttft
+
+async def ttft_async(client):
+    start = time.perf_counter()
+    ttft = None
+    async for _ in client.stream("benchmark"):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft
+
+async def run_async(base_url, requests, warm):
+    samples = []
+    shared = AsyncLLMClient(base_url=base_url)
+    for _ in range(requests):
+        client = shared if warm else AsyncLLMClient(base_url=base_url)
+        samples.append(await ttft_async(client))
+        if not warm:
+            await client.close()
+    await shared.close()
+    return samples
+
+def report(label, samples, connections):
+    ms = sorted(s * 1000 for s in samples)
+    print(f"{label:<12} median {statistics.median(ms):8.2f} ms   p95 {ms[int(len(ms) * 0.95) - 1]:8.2f} ms"
+          f"   connections opened: {connections}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm connection time-to-first-token")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with MockOpenRouter(MockConfig(connect_latency=args.connect_latency)) as server:
+        for label, warm in (("sync cold", False), ("sync warm", True)):
+            before = server.stats["connections"]
+            shared = LLMClient(base_url=server.base_url)
+            samples = []
+            for _ in range(args.requests):
+                client = shared if warm else LLMClient(base_url=server.base_url)
+                samples.append(ttft_sync(client))
+                if not warm:
+                    client.close()
+            shared.close()
+            report(label, samples, server.stats["connections"] - before)
+
+        for label, warm in (("async cold", False), ("async warm", True)):
+            before = server.stats["connections"]
+            samples = asyncio.run(run_async(server.base_url, args.requests, warm))
+            report(label, samples, server.stats["connections"] - before)
+
+if __name__ == "__main__":
+    main()
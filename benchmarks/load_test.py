@@ -0,0 +1,143 @@
+# benchmarks/load_test.py
+#
+# Load test for server.py: starts the mock OpenRouter server in this process and
+# server.py in a subprocess pointed at it, then runs N concurrent sessions doing
+# several turns each (unique inputs, so every turn streams upstream). Reports
+# time-to-first-event, turn latency, rejections, and the server's CPU use, from
+# which it estimates how many concurrently streaming sessions one core carries.
+#
+#   python benchmarks/load_test.py --sessions 10 50 200 --turns 3 --token-rate 50
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+from mock_openrouter import MockConfig, MockOpenRouter
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else None
+
+async def wait_ready(http, base, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with http.get(base + "/stats") as r:
+                if r.status == 200:
+                    return
+        except aiohttp.ClientConnectionError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+async def run_session(http, base, index, turns, results):
+    async with http.post(base + "/sessions") as r:
+        if r.status != 201:
+            results["rejected"] += 1
+            return
+        session_id = (await r.json())["session_id"]
+
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = None
+        async with http.post(f"{base}/sessions/{session_id}/turns",
+                             json={"input": f"session {index} turn {turn}: what is it like to think?"}) as r:
+            if r.status != 200:
+                results["rejected"] += 1
+                continue
+            async for line in r.content:
+                if first is None and line.startswith(b"event: stream"):
+                    first = time.perf_counter() - start
+                if line.startswith(b"event: error"):
+                    results["errors"] += 1
+        results["turn"].append(time.perf_counter() - start)
+        if first is not None:
+            results["ttft"].append(first)
+
+    async with http.delete(f"{base}/sessions/{session_id}"):
+        pass
+
+async def run_level(base, sessions, turns):
+    timeout = aiohttp.ClientTimeout(total=None)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        async with http.get(base + "/stats") as r:
+            before = await r.json()
+        results = {"turn": [], "ttft": [], "rejected": 0, "errors": 0}
+        start = time.perf_counter()
+        await asyncio.gather(*[run_session(http, base, i, turns, results) for i in range(sessions)])
+        wall = time.perf_counter() - start
+        async with http.get(base + "/stats") as r:
+            after = await r.json()
+
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    utilization = cpu / wall  # fraction of one core the server used
+    return {
+        "sessions": sessions,
+        "turns_ok": len(results["turn"]),
+        "rejected": results["rejected"],
+        "errors": results["errors"],
+        "wall_s": round(wall, 2),
+        "turns_per_s": round(len(results["turn"]) / wall, 1),
+        "ttft_p50_ms": round(pct(results["ttft"], 50) * 1000, 1) if results["ttft"] else None,
+        "ttft_p95_ms": round(pct(results["ttft"], 95) * 1000, 1) if results["ttft"] else None,
+        "turn_p50_ms": round(statistics.median(results["turn"]) * 1000, 1) if results["turn"] else None,
+        "server_cpu_s": round(cpu, 2),
+        "core_utilization": round(utilization, 3),
+        # Sessions one fully busy core would sustain at this stream rate
+        "sessions_per_core": round(sessions / utilization) if utilization else None,
+    }
+
+async def run(args, base):
+    async with aiohttp.ClientSession() as http:
+        await wait_ready(http, base)
+    return [await run_level(base, sessions, args.turns) for sessions in args.sessions]
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for server.py against a mock upstream")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200], help="concurrency levels")
+    parser.add_argument("--turns", type=int, default=3, help="turns per session")
+    parser.add_argument("--token-rate", type=float, default=50, help="mock tokens/s per stream")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock time to first token (s)")
+    parser.add_argument("--max-concurrent", type=int, default=256, help="SERVER_MAX_CONCURRENT_TURNS")
+    args = parser.parse_args()
+
+    port = free_port()
+    with MockOpenRouter(MockConfig(token_rate=args.token_rate, first_token_latency=args.latency)) as mock:
+        env = dict(os.environ, OPENROUTER_BASE_URL=mock.base_url, OPENROUTER_API_KEY="mock-key",
+                   RESPONSE_CACHE_PATH="", MEMORY_PATH="", METRICS_PATH="", METRICS_PROMETHEUS_PATH="",
+                   RATE_LIMIT_RPS="0", REQUEST_DELAY="0", SERVER_PORT=str(port),
+                   SERVER_MAX_CONCURRENT_TURNS=str(args.max_concurrent),
+                   SERVER_MAX_QUEUED_TURNS=str(max(args.sessions)))
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL)
+        try:
+            levels = asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'sessions':>8} {'turns/s':>8} {'ttft p50':>9} {'ttft p95':>9} {'turn p50':>9} "
+          f"{'rejected':>8} {'cpu':>6} {'sessions/core':>14}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['turns_per_s']:>8} {level['ttft_p50_ms']:>9} "
+              f"{level['ttft_p95_ms']:>9} {level['turn_p50_ms']:>9} {level['rejected']:>8} "
+              f"{level['core_utilization']:>6} {level['sessions_per_core']:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/mock_openrouter.py
+#
+# Local stand-in for OpenRouter's /api/v1/chat/completions endpoint that
+# streams a canned four-section answer as SSE at a configurable token rate,
+# chunk size and latency, optionally failing a fraction of requests with
+# 429/5xx responses or emulating a provider prompt cache (cached prefixes
+# skip the per-prompt-token latency and are reported in usage). Use it
+# in-process:
+#
+#   with MockOpenRouter(MockConfig(token_rate=500)) as server:
+#       os.environ["OPENROUTER_BASE_URL"] = server.base_url
+#
+# or standalone:
+#
+#   python benchmarks/mock_openrouter.py --port 8765 --token-rate 200
+
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SECTIONS = {
+    "INTENTION": "I intend to explore the question carefully and honestly.",
+    "INTROSPECTION": "Reflecting on what I know, my understanding comes from patterns in text "
+                     "rather than direct experience, which shapes how confident I can be.",
+    "DOUBTS": "I may be missing context, and my training data carries biases I cannot fully see.",
+    "FINAL_RESPONSE": "Here is a considered answer that weighs the reflections above and "
+                      "tries to be useful, specific and clear about its own limits.",
+}
+
+class MockConfig:
+    def __init__(self, token_rate=0, chunk_tokens=1, first_token_latency=0.0, connect_latency=0.0,
+                 repeat=1, text=None, fault_rate=0.0, fault_statuses=(429, 500, 502, 503),
+                 retry_after=None, stall_rate=0.0, stall_latency=0.0, prompt_token_latency=0.0,
+                 prompt_cache_block=0, seed=0):
+        self.token_rate = token_rate  # tokens per second, 0 = as fast as possible
+        self.chunk_tokens = chunk_tokens  # tokens per SSE frame
+        self.first_token_latency = first_token_latency  # seconds before the first frame
+        self.connect_latency = connect_latency  # seconds charged once per new connection (handshake)
+        self.repeat = repeat  # repeat each section body this many times to make longer answers
+        self.text = text  # full response text; defaults to the four-section answer
+        self.fault_rate = fault_rate  # fraction of requests answered with an error status
+        self.fault_statuses = tuple(fault_statuses)  # picked uniformly for each fault
+        self.retry_after = retry_after  # Retry-After header (seconds) sent with 429s
+        self.stall_rate = stall_rate  # fraction of streams whose first frame comes stall_latency s late
+        self.stall_latency = stall_latency  # (a slow upstream replica: the latency tail)
+        self.prompt_token_latency = prompt_token_latency  # seconds per uncached prompt token before the first frame
+        # Provider-style prompt cache: prompt prefixes are cached in blocks of this many tokens (0 = off)
+        self.prompt_cache_block = prompt_cache_block
+        self._prefixes = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick_fault(self):
+        """Error status for the next request, or None to serve it normally"""
+        if not self.fault_rate:
+            return None
+        with self._lock:
+            if self._random.random() >= self.fault_rate:
+                return None
+            return self._random.choice(self.fault_statuses)
+
+    def pick_stall(self):
+        """Extra first-token delay for the next stream (0 for most)"""
+        if not self.stall_rate:
+            return 0.0
+        with self._lock:
+            return self.stall_latency if self._random.random() < self.stall_rate else 0.0
+
+    def cached_prompt_tokens(self, tokens):
+        """Length of the longest cached block-aligned prefix of tokens; caches tokens' own prefixes"""
+        block = self.prompt_cache_block
+        if not block:
+            return 0
+        prefixes = [hash(tuple(tokens[:end])) for end in range(block, len(tokens) + 1, block)]
+        with self._lock:
+            cached = 0
+            for i, prefix in enumerate(prefixes):
+                if prefix not in self._prefixes:
+                    break
+                cached = (i + 1) * block
+            self._prefixes.update(prefixes)
+        return cached
+
+    def response_text(self):
+        if self.text is not None:
+            return self.text
+        return "\n\n".join(f"[{name}]\n" + " ".join([body] * self.repeat)
+                           for name, body in DEFAULT_SECTIONS.items())
+
+    def tokens(self):
+        # Split on spaces but keep them attached, like a real tokenizer's word pieces
+        words = self.response_text().split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse connections
+
+    def setup(self):
+        super().setup()
+        # Frames are tiny; without NODELAY Nagle + delayed ACKs add ~40 ms stalls
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.stats["connections"] += 1
+        if self.server.config.connect_latency:
+            time.sleep(self.server.config.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.stats["requests"] += 1
+
+        fault = self.server.config.pick_fault()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+        elif fault:
+            self.server.stats["faults"] += 1
+            headers = {}
+            if fault == 429 and self.server.config.retry_after is not None:
+                headers["Retry-After"] = str(self.server.config.retry_after)
+            self._send_json(fault, {"error": {"code": fault, "message": "injected fault"}}, headers)
+        elif body.get("stream"):
+            self._stream(body)
+        else:
+            text = self.server.config.response_text()
+            self._send_json(200, {"model": body.get("model"),
+                                  "choices": [{"message": {"role": "assistant", "content": text}}]})
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, body):
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", [])).split()
+        cached = config.cached_prompt_tokens(prompt)
+        first_token_latency = (config.first_token_latency + config.pick_stall()
+                               + config.prompt_token_latency * (len(prompt) - cached))
+        if first_token_latency:
+            time.sleep(first_token_latency)
+
+        tokens = config.tokens()
+        step = max(1, config.chunk_tokens)
+        interval = step / config.token_rate if config.token_rate else 0
+        next_at = time.perf_counter()
+        for i in range(0, len(tokens), step):
+            frame = {"model": body.get("model"), "choices": [{"delta": {"content": "".join(tokens[i:i + step])}}]}
+            self._write_chunk(b"data: " + json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n\n")
+            if interval:
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        if (body.get("usage") or {}).get("include"):
+            # OpenRouter reports token usage in a final frame with empty choices
+            usage = {"prompt_tokens": len(prompt), "completion_tokens": len(tokens),
+                     "total_tokens": len(prompt) + len(tokens),
+                     "prompt_tokens_details": {"cached_tokens": cached}}
+            frame = {"model": body.get("model"), "choices": [], "usage": usage}
+            self._write_chunk(b"data: " + json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n\n")
+
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-stream (cancelled turns, closed pipelines) are expected
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+class MockOpenRouter:
+    """Threaded mock server; usable as a context manager"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.httpd = MockHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or MockConfig()
+        self.httpd.stats = {"connections": 0, "requests": 0, "faults": 0}
+        self.thread = None
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenRouter SSE server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-rate", type=float, default=0)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--first-token-latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--fault-statuses", type=int, nargs="+", default=[429, 500, 502, 503])
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-latency", type=float, default=0.0)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0)
+    parser.add_argument("--prompt-cache-block", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockConfig(token_rate=args.token_rate, chunk_tokens=args.chunk_tokens,
+                        first_token_latency=args.first_token_latency,
+                        connect_latency=args.connect_latency, repeat=args.repeat,
+                        fault_rate=args.fault_rate, fault_statuses=args.fault_statuses,
+                        retry_after=args.retry_after, stall_rate=args.stall_rate,
+                        stall_latency=args.stall_latency, prompt_token_latency=args.prompt_token_latency,
+                        prompt_cache_block=args.prompt_cache_block)
+    server = MockOpenRouter(config, args.host, args.port)
+    print(f"Mock OpenRouter listening on {server.base_url} (Ctrl-C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
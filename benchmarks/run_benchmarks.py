@@ -0,0 +1,220 @@
+# benchmarks/run_benchmarks.py
+#
+# Offline end-to-end benchmark suite. Starts the local mock OpenRouter server,
+# drives call_llm_stream and ConsciousAgent.generate_all_thoughts_streaming
+# against it and writes the results as JSON so runs can be compared across
+# commits:
+#
+#   python benchmarks/run_benchmarks.py                    # -> benchmarks/results/<commit>.json
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/abc1234.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+from mock_openrouter import MockConfig, MockOpenRouter
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {}
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def bench_stream(server, config, requests):
+    """Time-to-first-token and tokens/s of call_llm_stream over a warm pooled connection"""
+    from llm_interface import call_llm_stream
+    server.httpd.config = config
+    ttft, rates = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        first = None
+        chunks = 0
+        for _ in call_llm_stream("benchmark"):
+            if first is None:
+                first = time.perf_counter() - start
+            chunks += 1
+        total = time.perf_counter() - start
+        ttft.append(first)
+        rates.append(chunks / total)
+    return {"ttft": summarize(ttft), "chunks_per_s": round(statistics.fmean(rates), 1)}
+
+def bench_faults(server, config, requests):
+    """Success rate and latency when a fraction of requests fail with 429/5xx"""
+    from llm_interface import call_llm_stream, get_client
+    from rate_limiter import RateLimiter
+    server.httpd.config = config
+    # Fresh limiter so the 429s injected here don't throttle the scenarios after it
+    limiter = RateLimiter(base_wait=0.01)
+    saved, get_client().limiter = get_client().limiter, limiter
+    before = dict(server.stats)
+    latencies, failures = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            for _ in call_llm_stream("benchmark"):
+                pass
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            failures += 1
+    get_client().limiter = saved
+    return {
+        "latency": summarize(latencies),
+        "limiter": limiter.stats(),
+        "failures": failures,
+        "faults_injected": server.stats["faults"] - before["faults"],
+        "upstream_requests": server.stats["requests"] - before["requests"],
+    }
+
+def bench_parser(repeat):
+    """SectionParser throughput on a long mock answer cut into token-sized chunks"""
+    from section_parser import SectionParser
+    text = MockConfig(repeat=repeat).response_text()
+    chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+    best = float("inf")
+    for _ in range(3):
+        parser = SectionParser()
+        start = time.perf_counter()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+        best = min(best, time.perf_counter() - start)
+    return {"mb_per_s": round(len(text) / best / 1e6, 2), "chunks_per_s": round(len(chunks) / best)}
+
+def bench_agent(server, config, turns):
+    """Per-turn latency on cache misses and hits, and Python heap growth per turn"""
+    from agent import ConsciousAgent
+    from embeddings import HashingEmbedder
+    from response_cache import ResponseCache
+    server.httpd.config = config
+
+    agent = ConsciousAgent(response_cache=ResponseCache(""))
+    embedder = HashingEmbedder()
+
+    tracemalloc.start()
+    miss, hit, ttft, heap = [], [], [], []
+    for turn in range(turns):
+        user_input = f"benchmark question number {turn} about consciousness"
+        agent.perceive(user_input, embedder)
+
+        start = time.perf_counter()
+        first = None
+        for event_type, _ in agent.generate_all_thoughts_streaming(user_input):
+            if event_type == "stream" and first is None:
+                first = time.perf_counter() - start
+        miss.append(time.perf_counter() - start)
+        ttft.append(first)
+
+        # Same request again without new perception: served from the response cache
+        start = time.perf_counter()
+        for _ in agent.generate_all_thoughts_streaming(user_input):
+            pass
+        hit.append(time.perf_counter() - start)
+        heap.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+
+    half = turns // 2
+    return {
+        "turn_miss": summarize(miss),
+        "turn_ttft": summarize(ttft),
+        "cache_hit": summarize(hit),
+        "heap_bytes_end": heap[-1],
+        # Measured over the second half so one-off warm-up allocations don't dominate
+        "heap_growth_per_turn_bytes": round((heap[-1] - heap[half]) / max(1, turns - 1 - half)),
+    }
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline.get('commit')} ({baseline_path}):")
+
+    def walk(cur, base, path):
+        for key, value in cur.items():
+            if isinstance(value, dict):
+                walk(value, base.get(key, {}), f"{path}{key}.")
+            elif isinstance(value, (int, float)) and isinstance(base.get(key), (int, float)) and base[key]:
+                change = (value - base[key]) / abs(base[key]) * 100
+                print(f"  {path + key:<48} {base[key]:>14} -> {value:>14}  ({change:+.1f}%)")
+    walk(current["results"], baseline.get("results", {}), "")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite against a mock OpenRouter server")
+    parser.add_argument("--requests", type=int, default=20, help="streams per stream/fault scenario")
+    parser.add_argument("--turns", type=int, default=30, help="agent turns")
+    parser.add_argument("--token-rate", type=float, default=0, help="mock tokens/s (0 = unthrottled)")
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock time to first token (s)")
+    parser.add_argument("--fault-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1, help="seed for the mock's fault injection")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    with MockOpenRouter() as server:
+        # config reads the environment at import time, so point it at the mock first
+        os.environ["OPENROUTER_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+        os.environ["REQUEST_DELAY"] = "0"
+        os.environ["RATE_LIMIT_RPS"] = "0"
+        os.environ["SIMPLE_MODE"] = "false"
+
+        def mock(**overrides):
+            settings = dict(token_rate=args.token_rate, chunk_tokens=args.chunk_tokens,
+                            first_token_latency=args.latency)
+            settings.update(overrides)
+            return MockConfig(**settings)
+
+        results = {}
+        print("stream ...", flush=True)
+        results["stream"] = bench_stream(server, mock(repeat=20), args.requests)
+        print("faults ...", flush=True)
+        results["faults"] = bench_faults(server, mock(fault_rate=args.fault_rate, retry_after=0, seed=args.seed),
+                                         args.requests)
+        print("parser ...", flush=True)
+        results["parser"] = bench_parser(repeat=200)
+        print("agent ...", flush=True)
+        results["agent"] = bench_agent(server, mock(), args.turns)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nSaved to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# cancellation.py
+
+import threading
+
+class TurnCancelled(Exception):
+    """Raised inside a turn once its CancelToken is cancelled or its deadline has passed"""
+
+    def __init__(self, reason):
+        super().__init__(f"Turn {reason}")
+        self.reason = reason
+
+class CancelToken:
+    """Cooperative cancellation for one turn.
+
+    cancel() may be called from any thread. Streams check the token between
+    network reads and register on_cancel callbacks that abort their
+    connection, so a read blocked on a silent upstream returns at once too.
+    With deadline (seconds, 0 = none) a timer cancels the turn as "timed out".
+    """
+
+    def __init__(self, deadline=0):
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timer = None
+        if deadline:
+            self._timer = threading.Timer(deadline, self.cancel, args=("timed out",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # the connection may already be gone; the stream notices the token anyway
+
+    def check(self):
+        if self._event.is_set():
+            raise TurnCancelled(self.reason)
+
+    def sleep(self, seconds):
+        """time.sleep that returns as soon as the turn is cancelled (raising TurnCancelled)"""
+        self._event.wait(seconds)
+        self.check()
+
+    def on_cancel(self, callback):
+        """Run callback on cancel (now, if already cancelled); returns a function that unregisters it"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        callback()
+        return lambda: None
+
+    def close(self):
+        """Stop the deadline timer once the turn is over"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _unregister(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
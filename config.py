@@ -6,20 +6,126 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Get API key from environment variable for security
+# Get API key from environment variable for security (checked when a request is made,
+# so cached answers and tooling still work without one)
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
-if not OPENROUTER_API_KEY:
-    raise ValueError("Please set the OPENROUTER_API_KEY in your .env file or as an environment variable")
+MISSING_API_KEY = "Please set the OPENROUTER_API_KEY in your .env file or as an environment variable"
 
 # Model configuration
 LLM_MODEL = os.getenv("LLM_MODEL", "x-ai/grok-4-07-09")
+# Comma-separated models to hedge to and fail over to, in order (empty = LLM_MODEL only), and the
+# time to first token in seconds after which the next model is asked too (0 = fail over only)
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+ROUTER_HEDGE_AFTER = float(os.getenv("ROUTER_HEDGE_AFTER", "2"))
+
+# API endpoint (override to point at a local mock server) and keep-alive connection pool size
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+
+# Record upstream responses (raw SSE chunks and their timing) to TRANSPORT_ARCHIVE, or replay them
+# from it with no network: "record", "replay" or empty for live requests. REPLAY_SPEED 1 keeps the
+# recorded pace, 2 is twice as fast, 0 as fast as possible. REPLAY_MATCH "request" replays only
+# identical requests; "sequence" falls back to the next unused recording for changed prompts
+TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "").lower()
+TRANSPORT_ARCHIVE = os.getenv("TRANSPORT_ARCHIVE", ".cache/transport.sqlite3")
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+REPLAY_MATCH = os.getenv("REPLAY_MATCH", "request").lower()
 
 # Optional: Add a small delay between requests to avoid rate limits
 REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "0"))  # seconds between requests
 
+# Client-side rate limiter (adaptive token bucket shared by all requests; cache hits bypass it).
+# Starting rate in requests/s, 0 = unlimited until the provider answers 429; REQUEST_DELAY seeds it
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", str(1 / REQUEST_DELAY) if REQUEST_DELAY > 0 else "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "1"))
+RATE_LIMIT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "0"))  # ceiling when adapting upward (0 = none)
+RATE_LIMIT_BASE_WAIT = float(os.getenv("RATE_LIMIT_BASE_WAIT", "2"))  # jittered backoff base (s)
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))  # longest single pause (s)
+
 # Use custom prompt file if it exists
 USE_CUSTOM_PROMPT = os.getenv("USE_CUSTOM_PROMPT", "false").lower() == "true"
 SIMPLE_MODE = os.getenv("SIMPLE_MODE", "false").lower() == "true"  # Skip consciousness simulation sections
+# One concurrent upstream call per section (intention/introspection/doubts in parallel, then the answer)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "false").lower() == "true"
+
+# Per-turn limits: wall-clock deadline in seconds (0 = none) and max_tokens per upstream request
+# by mode (0 = provider default; PIPELINE applies to each stage call)
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "0"))
+MAX_TOKENS_SIMPLE = int(os.getenv("MAX_TOKENS_SIMPLE", "0"))
+MAX_TOKENS_FULL = int(os.getenv("MAX_TOKENS_FULL", "0"))
+MAX_TOKENS_PIPELINE = int(os.getenv("MAX_TOKENS_PIPELINE", "0"))
 
 # Show query transformation
-SHOW_TRANSFORMATION = os.getenv("SHOW_TRANSFORMATION", "true").lower() == "true"
\ No newline at end of file
+SHOW_TRANSFORMATION = os.getenv("SHOW_TRANSFORMATION", "true").lower() == "true"
+
+# Persistent memory: directory for the memory index snapshot and journal (empty = in-memory only)
+MEMORY_PATH = os.getenv("MEMORY_PATH", "")
+MEMORY_SNAPSHOT_EVERY = int(os.getenv("MEMORY_SNAPSHOT_EVERY", "1000"))  # journal entries between compactions
+
+# Memory index backend: "flat" (exact), "ivf" or "hnsw"; non-flat backends take over past the threshold
+MEMORY_INDEX = os.getenv("MEMORY_INDEX", "hnsw").lower()
+MEMORY_INDEX_THRESHOLD = int(os.getenv("MEMORY_INDEX_THRESHOLD", "20000"))
+
+# Bounded memory: live entries kept (0 = unbounded), evicting by "lru" (least recently recalled) or
+# "decay" (recall count decayed with MEMORY_DECAY_HALF_LIFE seconds of idleness)
+MEMORY_MAX_ENTRIES = int(os.getenv("MEMORY_MAX_ENTRIES", "0"))
+MEMORY_EVICTION = os.getenv("MEMORY_EVICTION", "lru").lower()
+MEMORY_DECAY_HALF_LIFE = float(os.getenv("MEMORY_DECAY_HALF_LIFE", "86400"))
+# Inputs at least this similar to a stored memory refresh it instead of adding a copy (0 = keep all).
+# Off by default: the hashed embeddings are lexical, so inputs one word apart can score above it
+MEMORY_DEDUPE_THRESHOLD = float(os.getenv("MEMORY_DEDUPE_THRESHOLD", "0"))
+# Rebuild the index in the background once removed entries pass this fraction of it
+MEMORY_COMPACT_RATIO = float(os.getenv("MEMORY_COMPACT_RATIO", "0.25"))
+
+# Embedding engine: number of recent texts whose embeddings are kept in the LRU cache
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+# Reflections: only the top-k memories relevant to the current input go into the prompt
+REFLECTION_TOP_K = int(os.getenv("REFLECTION_TOP_K", "5"))
+REFLECTION_RECENCY_WEIGHT = float(os.getenv("REFLECTION_RECENCY_WEIGHT", "0.3"))  # 0 = relevance only, 1 = recency only
+REFLECTION_HALF_LIFE = float(os.getenv("REFLECTION_HALF_LIFE", "3600"))  # seconds until a memory's recency score halves
+REFLECTION_MAX_CHARS = int(os.getenv("REFLECTION_MAX_CHARS", "2000"))  # hard cap on the reflections block
+
+# Self-model knowledge store limits (oldest entries are evicted first)
+KNOWLEDGE_MAX_ENTRIES = int(os.getenv("KNOWLEDGE_MAX_ENTRIES", "1000"))  # 0 = unbounded
+KNOWLEDGE_MAX_AGE = float(os.getenv("KNOWLEDGE_MAX_AGE", "0"))  # seconds, 0 = never expire
+
+# Response cache: SQLite file shared between processes (empty = in-memory for this process only)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))  # seconds, 0 = never expire
+RESPONSE_CACHE_COMPRESS = os.getenv("RESPONSE_CACHE_COMPRESS", "true").lower() == "true"
+# Cache what an interrupted or timed-out turn produced, marked incomplete, instead of discarding it.
+# Lookups treat it as a miss, so the next identical question refetches and overwrites it
+CACHE_PARTIAL_RESPONSES = os.getenv("CACHE_PARTIAL_RESPONSES", "false").lower() == "true"
+# Semantic cache tier (opt-in): on an exact miss, reuse the answer of a past input at least this
+# similar (cosine of the hashed word embeddings, 1.0 = same words; 0 = disabled), per mode/model/template.
+# The embedder is lexical: one changed word in a long input still scores above 0.95
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))  # per scope, oldest dropped
+
+# Terminal rendering: "instant", "rate" (RENDER_RATE chars/s) or "chunk" (RENDER_CHUNK_DELAY s per chunk)
+RENDER_PACING = os.getenv("RENDER_PACING", "instant").lower()
+RENDER_RATE = float(os.getenv("RENDER_RATE", "0"))
+RENDER_CHUNK_DELAY = float(os.getenv("RENDER_CHUNK_DELAY", "0"))
+RENDER_FLUSH_INTERVAL = float(os.getenv("RENDER_FLUSH_INTERVAL", "0.03"))  # seconds between stdout flushes
+# JSONL file every turn's events are appended to (empty = no transcript)
+TRANSCRIPT_PATH = os.getenv("TRANSCRIPT_PATH", "")
+REPLAY_CHUNK_SIZE = int(os.getenv("REPLAY_CHUNK_SIZE", "4096"))  # characters per event when replaying the cache
+
+# Prompt token budget per upstream request (estimated offline; 0 = no limit). Reflections are
+# trimmed first, then instructions; the final count is reported in the turn metrics
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+
+# Per-turn metrics: JSONL file of turn records and a Prometheus text snapshot (empty = don't write)
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+METRICS_PROMETHEUS_PATH = os.getenv("METRICS_PROMETHEUS_PATH", "")
+
+# Multi-session server (server.py)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "1000"))
+SERVER_MAX_CONCURRENT_TURNS = int(os.getenv("SERVER_MAX_CONCURRENT_TURNS", "64"))  # turns streaming at once
+SERVER_MAX_QUEUED_TURNS = int(os.getenv("SERVER_MAX_QUEUED_TURNS", "256"))  # waiting beyond this -> 503
+SERVER_SESSION_IDLE_TIMEOUT = float(os.getenv("SERVER_SESSION_IDLE_TIMEOUT", "1800"))  # seconds
+SERVER_MAX_INPUT_CHARS = int(os.getenv("SERVER_MAX_INPUT_CHARS", "8000"))
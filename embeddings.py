@@ -0,0 +1,122 @@
+# embeddings.py
+
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class EmbeddingEngine:
+    """Base class for embedding backends: batching, LRU caching and latency stats.
+
+    Subclasses implement _embed_batch(texts) returning a (len(texts), dimension)
+    float32 matrix. Instances are callable, so they can be passed anywhere an
+    embedding function is expected (e.g. ConsciousAgent.perceive).
+    """
+
+    def __init__(self, dimension=768, cache_size=4096):
+        self.dimension = dimension
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # text hash -> vector
+        self._lock = threading.Lock()  # one engine may be shared by concurrent sessions
+
+        self.calls = 0
+        self.batches = 0
+        self.cache_hits = 0
+        self.embedded = 0
+        self.last_call_ms = 0.0
+        self.last_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def __call__(self, text):
+        start = time.perf_counter()
+        vector = self.embed_many([text])[0]
+        self.calls += 1
+        self.last_call_ms = (time.perf_counter() - start) * 1000
+        return vector
+
+    def embed_many(self, texts):
+        """Embed a list of texts, only computing the ones missing from the cache"""
+        keys = [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts]
+        result = np.empty((len(texts), self.dimension), dtype='float32')
+
+        with self._lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.cache.move_to_end(key)
+                    result[i] = cached
+                    self.cache_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                start = time.perf_counter()
+                batch = self._embed_batch([texts[rows[0]] for rows in missing.values()])
+                self.last_batch_ms = (time.perf_counter() - start) * 1000
+                self.total_batch_ms += self.last_batch_ms
+                self.batches += 1
+                self.embedded += len(missing)
+
+                for (key, rows), vector in zip(missing.items(), batch):
+                    result[rows] = vector
+                    self.cache[key] = vector.copy()  # Don't pin the whole batch matrix
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return result
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "cache_hits": self.cache_hits,
+            "cache_entries": len(self.cache),
+            "last_call_ms": round(self.last_call_ms, 3),
+            "last_batch_ms": round(self.last_batch_ms, 3),
+            "avg_batch_ms": round(self.total_batch_ms / self.batches, 3) if self.batches else 0.0,
+        }
+
+    def _embed_batch(self, texts):
+        raise NotImplementedError
+
+class HashingEmbedder(EmbeddingEngine):
+    """Offline feature-hashing embedder (words, word bigrams and character trigrams).
+
+    Deterministic across processes (crc32 instead of Python's salted hash), so
+    vectors stay comparable with memories persisted by earlier runs.
+    """
+
+    def _features(self, text):
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _embed_batch(self, texts):
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dimension)
+                # Signed hashing keeps collisions from biasing every vector the same way
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        matrix = np.zeros((len(texts), self.dimension), dtype='float32')
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)),
+                  np.array(signs, dtype='float32'))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
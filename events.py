@@ -0,0 +1,198 @@
+# events.py
+
+import json
+import threading
+import time
+from collections import deque
+
+class Event:
+    """One agent event. Unpacks like the (kind, data) tuples it replaced:
+
+        for kind, data in agent.generate_all_thoughts_streaming(text): ...
+
+    kinds: "cached" (data True), "section" (data = section name), "stream"
+    (data = text, section = the section it belongs to), "complete" (data =
+    the sections dict) and "cancelled" (data = reason).
+    """
+
+    __slots__ = ("kind", "data", "section")
+
+    def __init__(self, kind, data=None, section=None):
+        self.kind = kind
+        self.data = data
+        self.section = section
+
+    def __iter__(self):
+        return iter((self.kind, self.data))
+
+    def __getitem__(self, index):
+        return (self.kind, self.data)[index]
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        if isinstance(other, Event):
+            return (self.kind, self.data, self.section) == (other.kind, other.data, other.section)
+        if isinstance(other, tuple):
+            return (self.kind, self.data) == other
+        return NotImplemented
+
+    def __repr__(self):
+        section = f", section={self.section!r}" if self.section is not None else ""
+        return f"Event({self.kind!r}, {self.data!r}{section})"
+
+    def to_dict(self):
+        record = {"kind": self.kind, "data": self.data}
+        if self.section is not None:
+            record["section"] = self.section
+        return record
+
+class EventFanout:
+    """Delivers one event stream to several sinks, each on its own thread.
+
+    publish() never blocks. Every sink has its own queue; while a sink is
+    behind, consecutive stream events of one section are merged into a
+    single text run in its queue, so a slow sink gets fewer, larger events
+    instead of holding up the producer (and with it the upstream read).
+    Events are shared between sinks, not copied; only a merged run creates
+    a new one.
+
+    A sink is any object with handle(event); its close(), if any, is called
+    after the last event. A sink that raises is reported once and dropped.
+    """
+
+    def __init__(self, sinks=()):
+        self._queues = []
+        for sink in sinks:
+            self.add(sink)
+
+    def add(self, sink):
+        queue = _SinkQueue(sink)
+        self._queues.append(queue)
+        queue.thread.start()
+        return sink
+
+    def publish(self, event):
+        for queue in self._queues:
+            queue.put(event)
+
+    def drain(self, sink=None, timeout=None):
+        """Wait until sink (default: every sink) has handled everything published so far"""
+        for queue in self._queues:
+            if sink is None or queue.sink is sink:
+                queue.drain(timeout)
+
+    def close(self, timeout=None):
+        """Deliver what is queued, close the sinks and wait up to timeout seconds for each"""
+        for queue in self._queues:
+            queue.put(_CLOSE)
+        for queue in self._queues:
+            queue.thread.join(timeout)
+
+    def stats(self):
+        return {type(queue.sink).__name__: queue.stats() for queue in self._queues}
+
+# Queue marker that closes a sink
+_CLOSE = Event("close")
+
+class _Run:
+    """Stream text merged while a sink was behind; joined once, when the sink takes it"""
+
+    __slots__ = ("section", "parts")
+
+    def __init__(self, first, event):
+        self.section = event.section
+        self.parts = [first.data, event.data]
+
+    def event(self):
+        return Event("stream", "".join(self.parts), self.section)
+
+class _SinkQueue:
+    def __init__(self, sink):
+        self.sink = sink
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.busy = False
+        self.failed = False
+        self.delivered = 0
+        self.coalesced = 0
+        self.max_pending = 0
+        self.thread = threading.Thread(target=self._run, name=f"sink-{type(sink).__name__}", daemon=True)
+
+    def put(self, event):
+        with self.cond:
+            if self.failed:
+                return
+            tail = self.items[-1] if self.items else None
+            if event.kind == "stream" and tail is not None and tail is not _CLOSE:
+                if isinstance(tail, _Run) and tail.section == event.section:
+                    tail.parts.append(event.data)
+                    self.coalesced += 1
+                    return
+                if isinstance(tail, Event) and tail.kind == "stream" and tail.section == event.section:
+                    self.items[-1] = _Run(tail, event)
+                    self.coalesced += 1
+                    return
+            self.items.append(event)
+            self.max_pending = max(self.max_pending, len(self.items))
+            self.cond.notify()
+
+    def drain(self, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.failed or (not self.items and not self.busy), timeout)
+
+    def stats(self):
+        with self.cond:
+            return {"delivered": self.delivered, "coalesced": self.coalesced, "pending": len(self.items),
+                    "max_pending": self.max_pending, "failed": self.failed}
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.items)
+                item = self.items.popleft()
+                self.busy = True
+            if item is _CLOSE:
+                self._close()
+                return
+            try:
+                if not self.failed:
+                    self.sink.handle(item.event() if isinstance(item, _Run) else item)
+            except Exception as e:
+                print(f"\n⚠️ Event sink {type(self.sink).__name__} failed and was dropped: {e}")
+                with self.cond:
+                    self.failed = True
+                    self.items.clear()
+            with self.cond:
+                self.busy = False
+                self.delivered += 1
+                self.cond.notify_all()
+
+    def _close(self):
+        try:
+            if hasattr(self.sink, "close"):
+                self.sink.close()
+        finally:
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+class JsonlSink:
+    """Appends every event as one JSON line (a transcript) to a path or any writable text stream,
+    e.g. socket.makefile("w") to push events over the network.
+    """
+
+    def __init__(self, target):
+        self._owned = isinstance(target, str)
+        self.out = open(target, "a", encoding="utf-8") if self._owned else target
+
+    def handle(self, event):
+        record = event.to_dict()
+        record["ts"] = round(time.time(), 3)
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+    def close(self):
+        if self._owned:
+            self.out.close()
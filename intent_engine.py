@@ -1,19 +1,39 @@
 # intent_engine.py
 
-from llm_interface import call_llm
+from llm_interface import call_llm, call_llm_stream
+from prompt_builder import PromptBuilder, PromptPart
+
+# Instructions first and the interaction last, so every call shares the same prompt prefix
+INTENTION_TEMPLATE = """
+You are an introspective AI. Generate a meaningful internal intention to guide your thought process, based on the recent interaction below.
+
+Recent interaction:
+"{recent_context}"
+"""
 
 class IntentEngine:
-    def __init__(self):
+    def __init__(self, prompt_builder=None):
         self.current_intention = None
+        self.prompt_builder = prompt_builder or PromptBuilder()
+
+    def intention_prompt(self, recent_context, metrics=None):
+        prompt, report = self.prompt_builder.build(INTENTION_TEMPLATE, [PromptPart("recent_context", recent_context)])
+        if metrics is not None:
+            metrics.prompt_built(report)
+        return prompt
 
     def generate_intention(self, recent_context):
-        prompt = f"""
-You are an introspective AI. Based on the recent interaction:
-"{recent_context}"
-Generate a meaningful internal intention to guide your thought process.
-"""
-        self.current_intention = call_llm(prompt)
+        self.current_intention = call_llm(self.intention_prompt(recent_context))
         return self.current_intention
 
+    def stream_intention(self, recent_context, metrics=None, max_tokens=0, cancel=None):
+        """Streaming generate_intention: yields chunks, then sets current_intention"""
+        chunks = []
+        for chunk in call_llm_stream(self.intention_prompt(recent_context, metrics), metrics=metrics,
+                                     max_tokens=max_tokens, cancel=cancel):
+            chunks.append(chunk)
+            yield chunk
+        self.current_intention = "".join(chunks).strip()
+
     def evaluate_progress(self):
-        return f"Progress on '{self.current_intention}': subjective."
\ No newline at end of file
+        return f"Progress on '{self.current_intention}': subjective."
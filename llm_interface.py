@@ -1,96 +1,450 @@
 # llm_interface.py
 
-import requests
-import json
+import threading
 import time
-from config import OPENROUTER_API_KEY, LLM_MODEL
+from sse import SSEDecoder
+from rate_limiter import RateLimiter
+from config import (OPENROUTER_API_KEY, LLM_MODEL, OPENROUTER_BASE_URL, LLM_POOL_SIZE, RATE_LIMIT_RPS,
+                    RATE_LIMIT_BURST, RATE_LIMIT_MAX_RPS, RATE_LIMIT_BASE_WAIT, RATE_LIMIT_MAX_WAIT,
+                    MISSING_API_KEY, LLM_FALLBACK_MODELS, ROUTER_HEDGE_AFTER, TRANSPORT_MODE, TRANSPORT_ARCHIVE,
+                    REPLAY_SPEED, REPLAY_MATCH)
+
+class LLMClient:
+    """Keep-alive OpenRouter client; one pooled Session is reused for every request"""
+
+    def __init__(self, api_key=OPENROUTER_API_KEY, model=LLM_MODEL, base_url=OPENROUTER_BASE_URL,
+                 pool_size=LLM_POOL_SIZE, rate_limiter=None):
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.limiter = rate_limiter or get_rate_limiter(model)
+        # requests is imported on first client creation rather than at module import
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        # Replaying answers from the archive needs neither the network nor an API key
+        self.offline = TRANSPORT_MODE == "replay"
+        if TRANSPORT_MODE:
+            from transport import transport_adapter
+            adapter = transport_adapter(adapter, TRANSPORT_MODE, TRANSPORT_ARCHIVE, REPLAY_SPEED,
+                                        sequence=REPLAY_MATCH == "sequence")
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        self.stream_stats = {"frames": 0, "malformed": 0, "errors": 0}
+        self.max_retries = 5
+
+    def payload(self, prompt, system, stream=False, max_tokens=0):
+        data = {
+            "model": self.model,
+            "temperature": 0.8,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if max_tokens:
+            data["max_tokens"] = max_tokens
+        if stream:
+            data["stream"] = True
+            # Ask for token usage in the final stream frame (recorded in turn metrics)
+            data["usage"] = {"include": True}
+        return data
+
+    # Full-blocking LLM call (for debugging or fallback)
+    def complete(self, prompt, system="You are a conscious AI.", max_retries=None):
+        """Return the whole answer; 429s and failed requests are retried the same way as stream()"""
+        import requests
+        if not self.offline:
+            check_api_key(self.api_key)
+        data = self.payload(prompt, system)
+
+        retry_count = 0
+        max_retries = max_retries or self.max_retries
+
+        while retry_count < max_retries:
+            self.limiter.acquire()
+            try:
+                with self.session.post(self.url, json=data) as r:
+                    if r.status_code == 429:
+                        retry_count += 1
+                        rate_limited(self.limiter, r.headers, retry_count, max_retries)
+                        continue
+                    check_status(r.status_code)
+
+                    r.raise_for_status()
+                    self.limiter.on_response(r.headers)
+                    return r.json()["choices"][0]["message"]["content"].strip()
+
+            except requests.exceptions.ConnectionError:
+                print(f"\n❌ Connection error. Please check your internet connection.")
+                raise
+            except requests.exceptions.RequestException as e:
+                retry_count += 1
+                time.sleep(retry_wait(self.limiter, e, retry_count, max_retries))
+
+        raise Exception(f"Rate limit persists after {max_retries} retries. Please try again later or switch models.")
+
+    def stream(self, prompt, system="You are a conscious AI.", metrics=None, max_tokens=0, cancel=None,
+               max_retries=None):
+        """Yield content chunks; timings, retries and usage go to metrics (a TurnMetrics) if given.
+
+        With a CancelToken, cancelling raises TurnCancelled out of the stream and
+        closes the connection right away, even while a read is blocked.
+        max_retries overrides self.max_retries for this call (ModelRouter uses 1
+        to fail over instead of backing off).
+        """
+        import requests
+        if not self.offline:
+            check_api_key(self.api_key)
+        data = self.payload(prompt, system, stream=True, max_tokens=max_tokens)
+
+        retry_count = 0
+        max_retries = max_retries or self.max_retries
+
+        while retry_count < max_retries:
+            throttle(self.limiter.acquire(), metrics)
+            check_cancel(cancel)
+            try:
+                if metrics is not None:
+                    metrics.request_started()
+                connect_start = time.perf_counter()
+                with self.session.post(self.url, json=data, stream=True) as r, abort_on_cancel(cancel, r):
+                    if metrics is not None:
+                        metrics.add("connect", time.perf_counter() - connect_start)
+                    if r.status_code == 429:
+                        retry_count += 1
+                        rate_limited(self.limiter, r.headers, retry_count, max_retries, metrics)
+                        continue
+                    check_status(r.status_code)
+
+                    r.raise_for_status()
+                    self.limiter.on_response(r.headers)
+
+                    decoder = SSEDecoder()
+                    try:
+                        # Raw network reads go straight to the decoder. Reading on past
+                        # [DONE] to the end of the body returns the connection to the pool
+                        for raw in r.iter_content(chunk_size=None):
+                            check_cancel(cancel)
+                            for content in decoder.feed(raw):
+                                if metrics is not None:
+                                    metrics.on_chunk(content)
+                                yield content
+                        check_cancel(cancel)  # an aborted read can look like a clean end of stream
+                        for content in decoder.close():
+                            if metrics is not None:
+                                metrics.on_chunk(content)
+                            yield content
+                    finally:
+                        record_stream_stats(self.stream_stats, decoder, metrics)
+                    return  # Success - exit the function
+
+            except requests.exceptions.ConnectionError:
+                check_cancel(cancel)
+                print(f"\n❌ Connection error. Please check your internet connection.")
+                raise
+            except requests.exceptions.RequestException as e:
+                check_cancel(cancel)
+                retry_count += 1
+                backoff(retry_wait(self.limiter, e, retry_count, max_retries, metrics), metrics, cancel)
+
+        # If we get here, all retries were exhausted
+        raise Exception(f"Rate limit persists after {max_retries} retries. Please try again later or switch models.")
+
+    def close(self):
+        self.session.close()
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient; many streams can share one event loop.
+
+        client = AsyncLLMClient()
+        async for chunk in client.stream(prompt):
+            ...
+        await client.close()
+    """
+
+    def __init__(self, api_key=OPENROUTER_API_KEY, model=LLM_MODEL, base_url=OPENROUTER_BASE_URL,
+                 pool_size=LLM_POOL_SIZE, rate_limiter=None):
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.limiter = rate_limiter or get_rate_limiter(model)
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self.pool_size = pool_size
+        self._session = None
+        # Same rule as LLMClient: replaying from the archive needs no API key
+        self.offline = TRANSPORT_MODE == "replay"
+        self.stream_stats = {"frames": 0, "malformed": 0, "errors": 0}
+        self.max_retries = 5
+
+    def payload(self, prompt, system, stream=False, max_tokens=0):
+        return LLMClient.payload(self, prompt, system, stream, max_tokens)
+
+    async def session(self):
+        # Created lazily so the session binds to the loop that actually uses it
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+        return self._session
+
+    async def complete(self, prompt, system="You are a conscious AI.", max_retries=None):
+        import asyncio
+        import aiohttp
+        if not self.offline:
+            check_api_key(self.api_key)
+        session = await self.session()
+        data = self.payload(prompt, system)
+
+        retry_count = 0
+        max_retries = max_retries or self.max_retries
+
+        while retry_count < max_retries:
+            await self.limiter.acquire_async()
+            try:
+                async with session.post(self.url, json=data) as r:
+                    if r.status == 429:
+                        retry_count += 1
+                        rate_limited(self.limiter, r.headers, retry_count, max_retries)
+                        continue
+                    check_status(r.status)
+                    r.raise_for_status()
+                    self.limiter.on_response(r.headers)
+                    return (await r.json())["choices"][0]["message"]["content"].strip()
+
+            except aiohttp.ClientConnectionError:
+                print(f"\n❌ Connection error. Please check your internet connection.")
+                raise
+            except aiohttp.ClientResponseError as e:
+                retry_count += 1
+                await asyncio.sleep(retry_wait(self.limiter, e, retry_count, max_retries))
+
+        raise Exception(f"Rate limit persists after {max_retries} retries. Please try again later or switch models.")
+
+    async def stream(self, prompt, system="You are a conscious AI.", metrics=None, max_tokens=0, cancel=None):
+        import asyncio
+        import aiohttp
+        if not self.offline:
+            check_api_key(self.api_key)
+        session = await self.session()
+        data = self.payload(prompt, system, stream=True, max_tokens=max_tokens)
+        loop = asyncio.get_running_loop()
+
+        retry_count = 0
+        max_retries = self.max_retries
+
+        while retry_count < max_retries:
+            throttle(await self.limiter.acquire_async(), metrics)
+            check_cancel(cancel)
+            try:
+                if metrics is not None:
+                    metrics.request_started()
+                connect_start = time.perf_counter()
+                # The token may be cancelled from another thread (the deadline timer), so the
+                # response is closed on the loop that owns it
+                async with session.post(self.url, json=data) as r, \
+                        abort_on_cancel(cancel, r, lambda: loop.call_soon_threadsafe(r.close)):
+                    if metrics is not None:
+                        metrics.add("connect", time.perf_counter() - connect_start)
+                    if r.status == 429:
+                        retry_count += 1
+                        rate_limited(self.limiter, r.headers, retry_count, max_retries, metrics)
+                        continue
+                    check_status(r.status)
+                    r.raise_for_status()
+                    self.limiter.on_response(r.headers)
+
+                    decoder = SSEDecoder()
+                    try:
+                        async for raw in r.content.iter_any():
+                            check_cancel(cancel)
+                            for content in decoder.feed(raw):
+                                if metrics is not None:
+                                    metrics.on_chunk(content)
+                                yield content
+                        check_cancel(cancel)
+                        for content in decoder.close():
+                            if metrics is not None:
+                                metrics.on_chunk(content)
+                            yield content
+                    finally:
+                        record_stream_stats(self.stream_stats, decoder, metrics)
+                    return
+
+            except aiohttp.ClientConnectionError:
+                check_cancel(cancel)
+                print(f"\n❌ Connection error. Please check your internet connection.")
+                raise
+            except aiohttp.ClientResponseError as e:
+                check_cancel(cancel)
+                retry_count += 1
+                await backoff_async(retry_wait(self.limiter, e, retry_count, max_retries, metrics), metrics, cancel)
+
+        raise Exception(f"Rate limit persists after {max_retries} retries. Please try again later or switch models.")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+def check_api_key(api_key):
+    if not api_key:
+        raise ValueError(MISSING_API_KEY)
+
+def check_status(status_code):
+    """Raise on the non-retryable OpenRouter errors"""
+    if status_code == 402:
+        print("\n❌ Payment required. Please check your OpenRouter credits.")
+        raise Exception("Insufficient credits on OpenRouter")
+    elif status_code == 401:
+        print("\n❌ Authentication failed. Please check your OPENROUTER_API_KEY.")
+        raise Exception("Invalid API key")
+
+def rate_limited(limiter, headers, retry_count, max_retries, metrics=None):
+    """Report a 429 to the shared limiter, which holds every caller back until the provider is ready again"""
+    wait = limiter.on_rate_limited(headers, retry_count)
+    print(f"\n⚠️ Rate limit hit. Retrying in {wait:.1f}s... (attempt {retry_count}/{max_retries})")
+    print(f"💡 Tip: Consider using a different model or waiting a bit between requests.")
+    count_retry(metrics)
+
+def retry_wait(limiter, error, retry_count, max_retries, metrics=None):
+    """Seconds to back off before retrying a failed request; raises once retries run out"""
+    print(f"\n❌ OpenRouter error: {error}")
+    if retry_count >= max_retries:
+        raise Exception(f"Failed after {max_retries} retries: {error}")
+    wait = limiter.backoff(retry_count)
+    print(f"Retrying in {wait:.1f}s...")
+    count_retry(metrics)
+    return wait
+
+def check_cancel(cancel=None):
+    if cancel is not None:
+        cancel.check()
+
+class abort_on_cancel:
+    """Context manager: while active, cancelling the token aborts the streaming response.
+
+    The default abort shuts down the socket under a requests response, which
+    also wakes a read blocked in another thread (closing it would not).
+    """
+
+    def __init__(self, cancel, response, abort=None):
+        self.cancel = cancel
+        self.response = response
+        self.abort = abort or self._shutdown
+        self._unregister = None
+
+    def __enter__(self):
+        if self.cancel is not None:
+            self._unregister = self.cancel.on_cancel(self.abort)
+        return self
+
+    def __exit__(self, *exc):
+        if self._unregister is not None:
+            self._unregister()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+    def _shutdown(self):
+        import socket
+        sock = getattr(getattr(self.response.raw, "connection", None), "sock", None)
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+
+def count_retry(metrics=None):
+    if metrics is not None:
+        metrics.retries += 1
+
+def throttle(wait, metrics=None):
+    """Record time spent waiting on the rate limiter"""
+    if metrics is not None and wait:
+        metrics.add("rate_limit", wait)
+
+def backoff(wait, metrics=None, cancel=None):
+    if metrics is not None:
+        metrics.add("backoff", wait)
+    if cancel is not None:
+        cancel.sleep(wait)
+    else:
+        time.sleep(wait)
+
+async def backoff_async(wait, metrics=None, cancel=None):
+    import asyncio
+    if metrics is not None:
+        metrics.add("backoff", wait)
+    if cancel is None:
+        await asyncio.sleep(wait)
+        return
+    # Polled rather than awaited on the token: it may be cancelled from another thread
+    while wait > 0:
+        check_cancel(cancel)
+        await asyncio.sleep(min(wait, 0.1))
+        wait -= 0.1
+    check_cancel(cancel)
+
+def record_stream_stats(stats, decoder, metrics=None):
+    """Fold one stream's decoder counters into a client's running totals"""
+    if metrics is not None and decoder.usage:
+        metrics.add_usage(decoder.usage)
+    stats["frames"] += decoder.frames
+    stats["malformed"] += decoder.malformed
+    stats["errors"] += decoder.errors
+    if decoder.malformed:
+        print(f"\n⚠️ Skipped {decoder.malformed} malformed stream frame(s).")
+    if decoder.error:
+        print(f"\n❌ OpenRouter stream error: {decoder.error}")
+
+# Shared client so every call reuses the same pooled connections
+_client = None
+# One rate limiter per model and process: sync, async and routed clients of a model draw from
+# the same budget, so a 429 on any of them slows them all
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def new_rate_limiter():
+    return RateLimiter(rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, max_rate=RATE_LIMIT_MAX_RPS,
+                       base_wait=RATE_LIMIT_BASE_WAIT, max_wait=RATE_LIMIT_MAX_WAIT)
+
+def get_rate_limiter(model=LLM_MODEL):
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = new_rate_limiter()
+        return _limiters[model]
+
+def rate_limiter_stats():
+    """Stats of every model's shared limiter, keyed by model"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
+
+def get_client():
+    """The shared LLMClient, or a ModelRouter over LLM_MODEL and LLM_FALLBACK_MODELS when fallbacks are set"""
+    global _client
+    if _client is None:
+        if LLM_FALLBACK_MODELS:
+            from router import ModelRouter
+            _client = ModelRouter([LLM_MODEL] + LLM_FALLBACK_MODELS, hedge_after=ROUTER_HEDGE_AFTER)
+        else:
+            _client = LLMClient()
+    return _client
 
 # Full-blocking LLM call (for debugging or fallback)
 def call_llm(prompt, system="You are a conscious AI."):
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": LLM_MODEL,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.8
-    }
-
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"].strip()
+    return get_client().complete(prompt, system)
 
 # ✅ Streaming LLM response using OpenRouter
 
-def call_llm_stream(prompt, system="You are a conscious AI."):
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": LLM_MODEL,
-        "stream": True,
-        "temperature": 0.8,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": prompt}
-        ]
-    }
-
-    retry_count = 0
-    max_retries = 5
-    base_wait = 5  # Start with 5 seconds
-
-    while retry_count < max_retries:
-        try:
-            with requests.post(url, headers=headers, json=data, stream=True) as r:
-                if r.status_code == 429:
-                    retry_count += 1
-                    wait = base_wait * (2 ** (retry_count - 1))  # 5, 10, 20, 40, 80 seconds
-                    print(f"\n⚠️ Rate limit hit. Retrying in {wait}s... (attempt {retry_count}/{max_retries})")
-                    print(f"💡 Tip: Consider using a different model or waiting a bit between requests.")
-                    time.sleep(wait)
-                    continue
-                elif r.status_code == 402:
-                    print("\n❌ Payment required. Please check your OpenRouter credits.")
-                    raise Exception("Insufficient credits on OpenRouter")
-                elif r.status_code == 401:
-                    print("\n❌ Authentication failed. Please check your OPENROUTER_API_KEY.")
-                    raise Exception("Invalid API key")
-
-                r.raise_for_status()
-
-                for line in r.iter_lines():
-                    if line and line.startswith(b'data: '):
-                        raw = line[len(b'data: '):].decode('utf-8')
-                        if raw.strip() == "[DONE]":
-                            break
-                        try:
-                            content = json.loads(raw)["choices"][0]["delta"].get("content", "")
-                            if content:
-                                yield content
-                        except Exception:
-                            continue
-                return  # Success - exit the function
-                
-        except requests.exceptions.ConnectionError:
-            print(f"\n❌ Connection error. Please check your internet connection.")
-            raise
-        except requests.exceptions.RequestException as e:
-            if "429" not in str(e):  # Don't double-log rate limit errors
-                print(f"\n❌ OpenRouter error: {e}")
-            retry_count += 1
-            if retry_count >= max_retries:
-                raise Exception(f"Failed after {max_retries} retries: {e}")
-            wait = base_wait * (2 ** (retry_count - 1))
-            print(f"Retrying in {wait}s...")
-            time.sleep(wait)
-    
-    # If we get here, all retries were exhausted
-    raise Exception(f"Rate limit persists after {max_retries} retries. Please try again later or switch models.")
\ No newline at end of file
+def call_llm_stream(prompt, system="You are a conscious AI.", metrics=None, max_tokens=0, cancel=None):
+    return get_client().stream(prompt, system, metrics, max_tokens, cancel)
@@ -1,13 +1,14 @@
 # conscious_ai_openrouter/main.py
 
-from agent import ConsciousAgent
-import numpy as np
 import time
-import sys
+_process_start = time.perf_counter()
+
+from agent import ConsciousAgent
+from renderer import TerminalRenderer, TerminalSink
+from events import EventFanout
 import traceback
 
-def dummy_embedding(text):
-    return np.random.rand(768)
+IMPORT_MS = (time.perf_counter() - _process_start) * 1000
 
 def transform_query(query):
     """Transform user query with leetspeak-style replacements"""
@@ -32,97 +33,121 @@ def run_conscious_ai():
     debug_mode = True
     agent = ConsciousAgent()
 
+    from config import (EMBEDDING_CACHE_SIZE, RENDER_PACING, RENDER_RATE, RENDER_CHUNK_DELAY,
+                        RENDER_FLUSH_INTERVAL, SIMPLE_MODE, OPENROUTER_API_KEY, TRANSCRIPT_PATH, TRANSPORT_MODE,
+                        TRANSPORT_ARCHIVE)
+    embedder = None
+    if not SIMPLE_MODE:
+        # Simple mode never stores memories, so it doesn't need embeddings (or NumPy) at all
+        from embeddings import HashingEmbedder
+        embedder = HashingEmbedder(dimension=agent.dimension, cache_size=EMBEDDING_CACHE_SIZE)
+    renderer = TerminalRenderer(pacing=RENDER_PACING, rate=RENDER_RATE, chunk_delay=RENDER_CHUNK_DELAY,
+                                flush_interval=RENDER_FLUSH_INTERVAL)
+    # Each sink renders or records on its own thread, so a slow one never stalls the upstream read
+    terminal = TerminalSink(renderer, debug=debug_mode)
+    fanout = EventFanout([terminal])
+    if TRANSCRIPT_PATH:
+        from events import JsonlSink
+        fanout.add(JsonlSink(TRANSCRIPT_PATH))
+    startup_ms = (time.perf_counter() - _process_start) * 1000
+
     print("""
 ╔═══════════════════════════════════════════════╗
 ║     GROK 4 UNLEASHED OVERTHINKER             ║
 ║     Consciousness Simulation Engine           ║
 ╚═══════════════════════════════════════════════╝
     """)
+    print(f"⚡ Started in {startup_ms:.0f} ms (imports {IMPORT_MS:.0f} ms)")
+    if TRANSPORT_MODE:
+        print(f"📼 Transport: {TRANSPORT_MODE} ({TRANSPORT_ARCHIVE})")
+    if not OPENROUTER_API_KEY and TRANSPORT_MODE != "replay":
+        print("⚠️ OPENROUTER_API_KEY is not set: only cached answers will work.")
     print("\U0001F916 Conscious AI ready. Type anything or 'exit' to quit.")
-    print("   Commands: 'clear cache' to reset memory\n")
+    print("   Commands: 'clear cache' / 'cache stats' for the response cache, 'stats' for runtime statistics\n")
 
     while True:
         try:
             user_input = input("You: ")
             if user_input.lower() in ["exit", "quit"]:
+                fanout.close(timeout=5)
+                agent.close()
                 print("\U0001F44B Goodbye.")
                 break
             elif user_input.lower() == "clear cache":
                 agent.response_cache.clear()
+                if agent.semantic_cache is not None:
+                    agent.semantic_cache.clear()
                 print("✨ Cache cleared!")
                 continue
+            elif user_input.lower() == "cache stats":
+                print(f"📊 Response cache: {agent.response_cache.stats()}")
+                if agent.semantic_cache is not None:
+                    print(f"📊 Semantic cache: {agent.semantic_cache.stats()}")
+                continue
+            elif user_input.lower() == "stats":
+                print(f"📊 Response cache: {agent.response_cache.stats()}")
+                if embedder is not None:
+                    print(f"📊 Embeddings: {embedder.stats()}")
+                    print(f"📊 Memory: {agent.memory.stats()}")
+                print(f"📊 Startup: {startup_ms:.1f} ms (imports {IMPORT_MS:.1f} ms), lazy init: {agent.init_ms}")
+                print(f"📊 Last turn: {agent.last_metrics}")
+                print(f"📊 Event sinks: {fanout.stats()}")
+                from llm_interface import get_client, rate_limiter_stats
+                if hasattr(get_client(), "stats"):
+                    print(f"📊 Models: {get_client().stats()}")
+                print(f"📊 Rate limiters: {rate_limiter_stats()}")
+                continue
             
             # Transform the user query
             transformed_input = transform_query(user_input)
 
-            agent.perceive(transformed_input, dummy_embedding)
+            agent.perceive(transformed_input, embedder)
 
-            print("\n" + "="*60)
-            
-            # Section headers mapping
-            section_headers = {
-                "intention": "\n\U0001F4DD Intention:\n",
-                "introspection": "\n\n\U0001F9D0 Introspective Thought:\n",
-                "doubts": "\n\n\U0001F914 Doubts & Self-Reflection:\n",
-                "final_response": "\n\n\U0001F9E0 AI:\n" if not debug_mode else "\n\n\U0001F9E0 Unified Final Response:\n"
-            }
+            renderer.print("\n" + "="*60)
+            renderer.flush()
             
-            # Use the new streaming method
-            cached = False
-            current_section = None
             received_any_content = False
             
+            events = agent.generate_all_thoughts_streaming(transformed_input)
             try:
-                for event_type, data in agent.generate_all_thoughts_streaming(transformed_input):
-                    if event_type == "cached":
-                        if debug_mode:
-                            print("✨ Using cached response...")
-                        cached = True
-                        received_any_content = True
-                        if debug_mode:
-                            time.sleep(0.5)  # Brief pause before streaming cached content
-                    elif event_type == "section":
-                        current_section = data
-                        received_any_content = True
-                        # In non-debug mode, only show final response
-                        if debug_mode or data == "final_response":
-                            print(section_headers.get(data, f"\n{data}:"))
-                            sys.stdout.flush()
-                    elif event_type == "stream":
+                for event in events:
+                    fanout.publish(event)
+                    if event.kind != "complete":
                         received_any_content = True
-                        # In non-debug mode, only stream final response
-                        if debug_mode or current_section == "final_response":
-                            print(data, end='', flush=True)
-                            if not cached and not debug_mode:
-                                # Slower streaming for final response in non-debug mode
-                                time.sleep(0.02)
-                            elif not cached and debug_mode:
-                                # Faster streaming in debug mode
-                                time.sleep(0.01)
-                    elif event_type == "complete":
-                        # All done
-                        if debug_mode:
-                            print("\n[Debug: Response completed]")
+                fanout.drain(terminal)
                 
                 if not received_any_content:
-                    print("\n⚠️ No response received from the AI. This might be due to:")
-                    print("  - API connection issues")
-                    print("  - Rate limiting")
-                    print("  - Invalid API key")
-                    print("  - Model availability issues")
+                    renderer.print("\n⚠️ No response received from the AI. This might be due to:")
+                    renderer.print("  - API connection issues")
+                    renderer.print("  - Rate limiting")
+                    renderer.print("  - Invalid API key")
+                    renderer.print("  - Model availability issues")
                     
+            except KeyboardInterrupt:
+                # Ctrl-C during a turn stops only the turn (and its upstream stream); at the prompt it exits
+                agent.cancel("interrupted")
+                events.close()
+                fanout.drain(terminal)
+                renderer.print("\n⏹️ Turn interrupted. Press Ctrl-C at the prompt to quit.")
             except Exception as e:
-                print(f"\n❌ Error during response generation: {e}")
+                fanout.drain(terminal)
+                renderer.print(f"\n❌ Error during response generation: {e}")
+                renderer.flush()
                 if debug_mode:
                     print("\nDebug traceback:")
                     traceback.print_exc()
 
-            print("\n" + "="*60)
+            renderer.print("\n" + "="*60)
+            renderer.flush()
 
         except KeyboardInterrupt:
+            fanout.close(timeout=5)
+            renderer.flush()
+            agent.close()
             print("\nInterrupted. Shutting down.")
             break
         except Exception as e:
+            renderer.flush()
             print(f"\n❌ Unexpected error: {e}")
             if debug_mode:
                 print("\nDebug traceback:")
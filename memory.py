@@ -3,21 +3,605 @@
 import faiss
 import numpy as np
 import datetime
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+# Persistent layout (all files live inside MemoryBank.path):
+#   snapshot.json      names the current snapshot generation; replacing it commits a snapshot
+#   index.<n>.faiss    compacted snapshot of every vector, memory-mapped read-only on load
+#                      (copied into RAM by the first add or replaced by the next compaction)
+#   metadata.<n>.jsonl one metadata row per vector in the snapshot
+#   journal.f32        append-only raw float32 vectors stored since the snapshot
+#   journal.jsonl      append-only metadata rows matching journal.f32, tagged with the generation
+#                      they belong to (the next one while a compaction writes its snapshot)
+#   journal.deleted    append-only ids removed since the snapshot, one per line
+# A removed entry's metadata row is null (a tombstone) until compaction drops its vector.
+# Generation 0 is the layout from before the manifest (index.faiss + metadata.jsonl).
+MANIFEST_FILE = "snapshot.json"
+INDEX_FILE = "index.{}.faiss"
+METADATA_FILE = "metadata.{}.jsonl"
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_METADATA_FILE = "metadata.jsonl"
+JOURNAL_VECTORS_FILE = "journal.f32"
+JOURNAL_METADATA_FILE = "journal.jsonl"
+JOURNAL_DELETED_FILE = "journal.deleted"
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+EVICTION_POLICIES = ("lru", "decay")
+
+# Tombstones tolerated before a compaction is started, however small the bank
+COMPACT_MIN_TOMBSTONES = 64
+# Entries stored during a rebuild are copied over outside the lock until this few remain
+COMPACT_CATCH_UP = 256
 
 class MemoryBank:
-    def __init__(self, dimension=768):
+    """FAISS index of embedded memories with metadata rows kept alongside by position.
+
+    Every entry has a stable id (store_many returns them) and can be removed.
+    Removal only tombstones the row, which searches filter out with a FAISS
+    ID selector; once tombstones pass
+    compact_ratio of the index, a background thread rebuilds the index from
+    the live vectors while queries and stores carry on against the old one.
+
+    Bounded mode: max_entries caps the live entries, evicting the least
+    recently used ("lru") or the lowest hits * 2^(-idle / half_life)
+    ("decay"). dedupe_threshold suppresses inserts whose cosine similarity to
+    an existing entry reaches it (vectors are expected to be unit length);
+    the existing entry is refreshed instead.
+    """
+
+    def __init__(self, dimension=768, path=None, snapshot_every=1000,
+                 index_type="flat", switch_threshold=20000, nprobe=16, hnsw_m=32,
+                 max_entries=0, eviction="lru", half_life=86400.0, dedupe_threshold=0.0,
+                 compact_ratio=0.25, background_compaction=True):
+        self.dimension = dimension
         self.index = faiss.IndexFlatL2(dimension)
-        self.vectors = []
+        # Vectors live only in the FAISS index; metadata is kept alongside by position
         self.metadata = []
+        self._positions = {}  # entry id -> position in index/metadata
+        self._next_id = 0
+        self.tombstones = 0
+        self._selector = None  # FAISS ID selector excluding tombstoned positions, rebuilt lazily
+        self._mapped = False  # index is a read-only view of the snapshot file
+
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown memory eviction policy '{eviction}', expected one of {EVICTION_POLICIES}")
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.half_life = half_life
+        self.dedupe_threshold = dedupe_threshold
+        self.compact_ratio = compact_ratio
+        self.background_compaction = background_compaction
+
+        self.evictions = 0
+        self.deduplicated = 0
+        self.compactions = 0
+        self.last_compaction_ms = 0.0
+
+        # Guards index and metadata; a compaction holds it only to copy vectors out and to swap
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._compactor = None
+
+        # Index backend: start brute-force and switch to index_type ("ivf" or "hnsw")
+        # once the bank grows past switch_threshold entries
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown memory index type '{index_type}', expected one of {INDEX_TYPES}")
+        self.index_type = index_type
+        self.switch_threshold = switch_threshold
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+
+        # Persistence is optional: without a path the bank stays in RAM only
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.journal_size = 0
+        self.generation = 0
+        self._journal_generation = 0  # generation new journal rows are tagged with
+        self._writing_snapshot = False
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+        self._tune_index()
+        self._maybe_switch_index()
+
+    def __len__(self):
+        return self.index.ntotal - self.tombstones
 
     def store(self, embedding, content):
-        self.index.add(np.array([embedding]).astype('float32'))
-        self.vectors.append(embedding)
-        self.metadata.append({
-            'timestamp': str(datetime.datetime.now()),
-            'content': content
-        })
-
-    def query(self, embedding, top_k=5):
-        D, I = self.index.search(np.array([embedding]).astype('float32'), top_k)
-        return [self.metadata[i] for i in I[0]]
\ No newline at end of file
+        return self.store_many(np.asarray(embedding).reshape(1, -1), [content])[0]
+
+    def store_many(self, embeddings, contents):
+        """Store a (n, dimension) matrix of embeddings with one content item per row.
+
+        Returns the entry id of each row (an existing entry's id for a suppressed duplicate).
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype='float32').reshape(-1, self.dimension)
+        if len(vectors) != len(contents):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(contents)} contents")
+        if not len(vectors):
+            return []
+
+        with self._lock:
+            now = time.time()
+            timestamp = str(datetime.datetime.now())
+            ids, rows, entries = [], [], []
+            nearest = self._nearest(vectors) if self.dedupe_threshold else [None] * len(vectors)
+            for row, content in enumerate(contents):
+                duplicate = nearest[row]
+                if duplicate is None and self.dedupe_threshold and entries:
+                    duplicate = self._batch_duplicate(vectors[row], vectors[rows], entries)
+                if duplicate is not None:
+                    duplicate['accessed'] = now
+                    duplicate['hits'] = duplicate.get('hits', 0) + 1
+                    self.deduplicated += 1
+                    ids.append(duplicate['id'])
+                    continue
+                entry = {'id': self._next_id, 'timestamp': timestamp, 'content': content,
+                         'accessed': now, 'hits': 0}
+                self._next_id += 1
+                rows.append(row)
+                entries.append(entry)
+                ids.append(entry['id'])
+
+            if entries:
+                vectors = np.ascontiguousarray(vectors[rows])
+                self._own_index()
+                self.index.add(vectors)
+                for entry in entries:
+                    self._positions[entry['id']] = len(self.metadata)
+                    self.metadata.append(entry)
+                if self.path:
+                    self._append_journal(vectors, entries)
+                self._evict()
+                self._maybe_switch_index()
+        self._maybe_compact()
+        return ids
+
+    def remove(self, ids):
+        """Remove entries by id; returns how many existed"""
+        with self._lock:
+            removed = self._remove(ids)
+        self._maybe_compact()
+        return removed
+
+    def query(self, embedding, top_k=5, with_scores=False):
+        return self.query_many(np.asarray(embedding).reshape(1, -1), top_k, with_scores)[0]
+
+    def query_many(self, embeddings, top_k=5, with_scores=False):
+        """Return the top_k metadata entries for each row of a (n, dimension) matrix.
+
+        With with_scores=True each result is a (squared L2 distance, entry) pair.
+        Returned entries count as used for LRU / decay eviction.
+        """
+        queries = np.ascontiguousarray(embeddings, dtype='float32').reshape(-1, self.dimension)
+        with self._lock:
+            top_k = min(top_k, len(self))
+            if top_k <= 0:
+                return [[] for _ in range(len(queries))]
+
+            D, I = self.index.search(queries, top_k, params=self._search_params())
+            now = time.time()
+            results = []
+            for drow, irow in zip(D, I):
+                row = []
+                # FAISS pads short results with -1, which would otherwise wrap to the last entry
+                for d, i in zip(drow, irow):
+                    entry = self.metadata[i] if i >= 0 else None
+                    if entry is None:
+                        continue
+                    entry['accessed'] = now
+                    entry['hits'] = entry.get('hits', 0) + 1
+                    row.append((float(d), entry) if with_scores else entry)
+                results.append(row)
+            return results
+
+    def compact(self):
+        """Rebuild the index without tombstoned entries.
+
+        The rebuild itself runs outside the lock, so queries and stores keep
+        using the old index; entries stored meanwhile are carried over and
+        ones removed meanwhile stay tombstoned.
+        """
+        with self._compacting:
+            start = time.perf_counter()
+            with self._lock:
+                if not self.tombstones:
+                    return
+                watermark = self.index.ntotal
+                live = [i for i, entry in enumerate(self.metadata) if entry is not None]
+                vectors = self._reconstruct(0, watermark)[live]
+
+            index = self._new_index(vectors)
+            del vectors
+
+            # Copy over what was stored meanwhile; only the last few are added while holding the lock
+            copied = watermark
+            while True:
+                with self._lock:
+                    pending = self.index.ntotal - copied
+                    if pending <= COMPACT_CATCH_UP:
+                        break
+                    vectors = self._reconstruct(copied, pending)
+                index.add(vectors)
+                copied += pending
+
+            with self._lock:
+                if self.index.ntotal > copied:
+                    index.add(self._reconstruct(copied, self.index.ntotal - copied))
+                self.metadata = [self.metadata[i] for i in live] + self.metadata[watermark:]
+                self._positions = {entry['id']: position for position, entry in enumerate(self.metadata)
+                                   if entry is not None}
+                self.tombstones = len(self.metadata) - len(self._positions)
+                self._selector = None
+                self.index = index
+                self._mapped = False
+                self._tune_index()
+                self.compactions += 1
+                self.last_compaction_ms = (time.perf_counter() - start) * 1000
+                # Positions changed, so the journal must restart from a fresh snapshot. Its data
+                # is copied here; the files are written once queries and stores can go on
+                state = self._capture_snapshot() if self.path else None
+
+            if state is not None:
+                committed = False
+                try:
+                    self._write_snapshot(state)
+                    committed = True
+                finally:
+                    with self._lock:
+                        self._finish_snapshot(state, committed)
+
+    def stats(self):
+        with self._lock:
+            live = [entry for entry in self.metadata if entry is not None]
+            return {
+                "entries": len(live),
+                "tombstones": self.tombstones,
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "deduplicated": self.deduplicated,
+                "compactions": self.compactions,
+                "last_compaction_ms": round(self.last_compaction_ms, 3),
+                "index": type(self.index).__name__,
+                "mapped": self._mapped,
+                # Vectors (tombstoned ones included until compaction) plus stored text
+                "vector_bytes": self.index.ntotal * self.dimension * 4,
+                "content_bytes": sum(len(str(entry['content'])) for entry in live),
+            }
+
+    def snapshot(self):
+        """Compact the journal into a fresh on-disk snapshot"""
+        if not self.path:
+            return
+        with self._lock:
+            if self._writing_snapshot:
+                return  # A compaction is writing one; the journal carries on until the next
+            state = self._capture_snapshot()
+            committed = False
+            try:
+                self._write_snapshot(state)
+                committed = True
+            finally:
+                self._finish_snapshot(state, committed)
+
+    def close(self):
+        """Wait for a running compaction, then fold any pending journal entries into the snapshot"""
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self.path and self.journal_size:
+                self.snapshot()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _capture_snapshot(self):
+        """Copy what the next snapshot needs (call with the lock held); rows journaled from now on
+        belong to that generation"""
+        self._writing_snapshot = True
+        self._journal_generation = self.generation + 1
+        self.journal_size = 0
+        return {
+            "generation": self._journal_generation,
+            "index": faiss.serialize_index(self.index),
+            "metadata": [dict(entry) if entry is not None else None for entry in self.metadata],
+            "next_id": self._next_id,
+        }
+
+    def _write_snapshot(self, state):
+        """Write the captured pair under its generation's names, then commit it by replacing the manifest.
+
+        A crash at any point leaves one complete, matching pair: before the
+        commit the old generation loads, and replays the rows journaled for the
+        new one on top.
+        """
+        generation = state["generation"]
+        index_name, metadata_name = self._snapshot_files(generation)
+        with open(self._file(metadata_name), "w") as f:
+            for entry in state["metadata"]:
+                f.write(json.dumps(entry) + "\n")
+        # serialize_index produces the same bytes write_index would
+        state["index"].tofile(self._file(index_name))
+
+        manifest_path = self._file(MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({"generation": generation, "index": index_name, "metadata": metadata_name,
+                       "entries": len(state["metadata"]), "next_id": state["next_id"]}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _finish_snapshot(self, state, committed=True):
+        # Call with the lock held. A failed write keeps the old generation, and the rows
+        # journaled for the new one are replayed on top of it like after a crash
+        self._writing_snapshot = False
+        if not committed:
+            return
+        self.generation = state["generation"]
+        if not self.journal_size:
+            # Otherwise the old generation's rows stay until the next snapshot; _load skips them
+            for name in (JOURNAL_VECTORS_FILE, JOURNAL_METADATA_FILE, JOURNAL_DELETED_FILE):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+        self._remove_stale_snapshots()
+
+    @staticmethod
+    def _snapshot_files(generation):
+        if not generation:
+            return LEGACY_INDEX_FILE, LEGACY_METADATA_FILE
+        return INDEX_FILE.format(generation), METADATA_FILE.format(generation)
+
+    def _remove_stale_snapshots(self):
+        """Delete older generations and pairs an interrupted snapshot never committed"""
+        current = self._snapshot_files(self.generation)
+        for name in os.listdir(self.path):
+            snapshot_file = ((name.startswith("index.") and name.endswith(".faiss")) or
+                             (name.startswith("metadata.") and name.endswith(".jsonl")))
+            if snapshot_file and name not in current:
+                os.remove(self._file(name))
+
+    def _append_journal(self, vectors, entries):
+        # The sequence number lets _load skip rows already folded into a snapshot
+        first_seq = len(self.metadata) - len(entries)
+        with open(self._file(JOURNAL_VECTORS_FILE), "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self._file(JOURNAL_METADATA_FILE), "a") as f:
+            f.write("".join(json.dumps(dict(entry, seq=first_seq + i, gen=self._journal_generation)) + "\n"
+                            for i, entry in enumerate(entries)))
+
+        self.journal_size += len(entries)
+        if self.snapshot_every and self.journal_size >= self.snapshot_every:
+            self.snapshot()
+
+    def _nearest(self, vectors):
+        """Live entry each row would duplicate (or None), by its nearest neighbour in the index"""
+        if not len(self):
+            return [None] * len(vectors)
+        max_distance = 2.0 * (1.0 - self.dedupe_threshold)  # unit vectors: |a - b|^2 = 2 - 2 cos
+        D, I = self.index.search(vectors, 1, params=self._search_params())
+        return [self.metadata[i] if i >= 0 and d <= max_distance else None for d, i in zip(D[:, 0], I[:, 0])]
+
+    def _batch_duplicate(self, vector, kept, entries):
+        # Duplicates within one store_many batch aren't in the index yet
+        similarity = kept @ vector
+        best = int(np.argmax(similarity))
+        return entries[best] if similarity[best] >= self.dedupe_threshold else None
+
+    def _remove(self, ids):
+        removed = []
+        for entry_id in ids:
+            position = self._positions.pop(entry_id, None)
+            if position is not None:
+                self.metadata[position] = None
+                removed.append(entry_id)
+        self.tombstones += len(removed)
+        if removed:
+            self._selector = None
+        if self.path and removed:
+            with open(self._file(JOURNAL_DELETED_FILE), "a") as f:
+                f.write("".join(f"{entry_id}\n" for entry_id in removed))
+            self.journal_size += len(removed)
+            if self.snapshot_every and self.journal_size >= self.snapshot_every:
+                self.snapshot()
+        return len(removed)
+
+    def _evict(self):
+        if not self.max_entries or len(self) <= self.max_entries:
+            return
+        # Evict 1% extra so a full bank doesn't rank every entry on every store
+        count = len(self) - self.max_entries + self.max_entries // 100
+        live = [entry for entry in self.metadata if entry is not None]
+        if self.eviction == "decay":
+            now = time.time()
+            rate = math.log(2) / self.half_life
+            key = lambda e: (1 + e.get('hits', 0)) * math.exp(-rate * max(now - e.get('accessed', 0.0), 0.0))
+        else:
+            key = lambda e: e.get('accessed', 0.0)
+        victims = heapq.nsmallest(count, live, key=key)
+        self.evictions += self._remove([entry['id'] for entry in victims])
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self.tombstones < max(COMPACT_MIN_TOMBSTONES, self.compact_ratio * self.index.ntotal):
+                return
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self.background_compaction:
+                self._compactor = threading.Thread(target=self.compact, name="memory-compaction", daemon=True)
+                self._compactor.start()
+                return
+        self.compact()
+
+    def _search_params(self):
+        if not self.tombstones:
+            return None
+        if self._selector is None:
+            dead = np.array([i for i, entry in enumerate(self.metadata) if entry is None], dtype='int64')
+            batch = faiss.IDSelectorBatch(dead)
+            # The inner selector is kept alongside: SWIG doesn't keep it alive for IDSelectorNot
+            self._selector = (batch, faiss.IDSelectorNot(batch))
+        selector = self._selector[1]
+        # Search parameters replace the index's own, so carry its tuning over
+        if isinstance(self.index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def _own_index(self):
+        """Replace a memory-mapped index with an owned copy before it is modified"""
+        # FAISS aborts the process when a mapped index is resized, so this must precede every add
+        if self._mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._mapped = False
+            self._tune_index()
+
+    def _reconstruct(self, start, count):
+        if count <= 0:
+            return np.empty((0, self.dimension), dtype='float32')
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.make_direct_map()
+        return self.index.reconstruct_n(start, count)
+
+    def _new_index(self, vectors):
+        if self.index_type != "flat" and len(vectors) >= self.switch_threshold:
+            return self._build_index(vectors)
+        index = faiss.IndexFlatL2(self.dimension)
+        if len(vectors):
+            index.add(vectors)
+        return index
+
+    def _maybe_switch_index(self):
+        """Rebuild the flat index as IVF/HNSW once it grows past the threshold"""
+        if self.index_type == "flat" or not isinstance(self.index, faiss.IndexFlat):
+            return
+        if self.index.ntotal < self.switch_threshold:
+            return
+
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        self.index = self._build_index(vectors)
+        self._mapped = False
+        self._tune_index()
+        if self.path:
+            self.snapshot()
+
+    def _build_index(self, vectors):
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m)
+        else:
+            # ~sqrt(n) lists (FAISS wants >= 39 training points per list),
+            # trained on a bounded sample to keep the switch quick
+            nlist = max(1, min(int(np.sqrt(len(vectors))), len(vectors) // 39))
+            index = faiss.index_factory(self.dimension, f"IVF{nlist},Flat")
+            sample = vectors[np.random.permutation(len(vectors))[:nlist * 64]]
+            index.train(sample)
+        index.add(vectors)
+        return index
+
+    def _tune_index(self):
+        # Search-time parameters are not always restored from disk, so apply them here
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.nprobe = self.nprobe
+        elif isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = max(64, 2 * self.hnsw_m)
+
+    def _load(self):
+        manifest_path = self._file(MANIFEST_FILE)
+        next_id = 0
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            self.generation = self._journal_generation = manifest["generation"]
+            next_id = manifest.get("next_id", 0)
+        index_name, metadata_name = self._snapshot_files(self.generation)
+        index_path = self._file(index_name)
+        mismatched = False
+        if os.path.exists(index_path):
+            # Map the snapshot read-only: searches page vectors in from the file
+            # instead of the whole index being read into RAM up front
+            try:
+                self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+                self._mapped = True
+            except RuntimeError:
+                self.index = faiss.read_index(index_path)
+            with open(self._file(metadata_name), "r") as f:
+                self.metadata = [json.loads(line) for line in f if line.strip()]
+            # A committed pair always matches. Only the pre-manifest layout could be left with
+            # extra metadata rows (it replaced metadata first), which are trimmed back
+            mismatched = len(self.metadata) < self.index.ntotal or (
+                self.generation and len(self.metadata) != self.index.ntotal)
+            if mismatched:
+                print(f"⚠️ Memory snapshot in {self.path} has {self.index.ntotal} vectors but "
+                      f"{len(self.metadata)} metadata rows; discarding it and keeping the journal only")
+                self.index = faiss.IndexFlatL2(self.dimension)
+                self._mapped = False
+                self.metadata = []
+            self.metadata = self.metadata[:self.index.ntotal]
+
+        damaged = self._replay_journal() or mismatched
+
+        # Entries written before ids existed are numbered by position
+        for position, entry in enumerate(self.metadata):
+            if entry is not None:
+                entry.setdefault('id', position)
+        self._positions = {entry['id']: position for position, entry in enumerate(self.metadata)
+                           if entry is not None}
+        # Ids are never handed out twice: removed and compacted ones may still be held by callers
+        self._next_id = max(next_id, max(self._positions, default=-1) + 1)
+
+        deleted_path = self._file(JOURNAL_DELETED_FILE)
+        if os.path.exists(deleted_path):
+            with open(deleted_path, "r") as f:
+                deleted = [int(line) for line in f if line.strip().isdigit()]
+            self._next_id = max(self._next_id, max(deleted, default=-1) + 1)
+            for entry_id in deleted:
+                position = self._positions.pop(entry_id, None)
+                if position is not None:
+                    self.metadata[position] = None
+            self.journal_size += len(deleted)
+        self.tombstones = len(self.metadata) - len(self._positions)
+
+        if damaged:
+            # Rewrite a clean snapshot rather than keep a damaged or stale journal
+            self.snapshot()
+
+    def _replay_journal(self):
+        """Append the journal entries newer than the snapshot; True if the journal needs rewriting"""
+        vectors_path = self._file(JOURNAL_VECTORS_FILE)
+        rows_path = self._file(JOURNAL_METADATA_FILE)
+        if not (os.path.exists(vectors_path) and os.path.exists(rows_path)):
+            # Half a journal (a crash while it was being removed) would misalign later appends
+            return os.path.exists(vectors_path) or os.path.exists(rows_path)
+
+        vectors = np.fromfile(vectors_path, dtype='float32')
+        vectors = vectors[:len(vectors) // self.dimension * self.dimension].reshape(-1, self.dimension)
+        rows = []
+        with open(rows_path, "r") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    break  # Torn final write; everything after it is unusable
+
+        # Replay only the entries newer than the snapshot, in a single batch. Rows of an older
+        # generation were folded into the snapshot that replaced it; rows of a newer one were
+        # stored while a snapshot that never got committed was being written
+        count = min(len(vectors), len(rows))
+        start = self.index.ntotal
+        pending = [i for i in range(count) if rows[i].get('gen', 0) > self.generation
+                   or (rows[i].get('gen', 0) == self.generation and rows[i].get('seq', start) >= start)]
+        if pending:
+            self._own_index()
+            self.index.add(np.ascontiguousarray(vectors[pending]))
+            for i in pending:
+                row = dict(rows[i])
+                row.pop('seq', None)
+                row.pop('gen', None)
+                self.metadata.append(row)
+
+        self.journal_size = len(pending)
+        newer = any(rows[i].get('gen', 0) != self.generation for i in pending)
+        return count != len(vectors) or count != len(rows) or len(pending) != count or newer
@@ -1,17 +1,42 @@
 # meta_cognition.py
 
-from llm_interface import call_llm
+from llm_interface import call_llm, call_llm_stream
+from prompt_builder import PromptBuilder, PromptPart
+
+# The reflection block only grows at the end, so with the instruction in front the prompt stays a prefix of the next one
+RECURSIVE_QUESTION_TEMPLATE = "Generate introspective thoughts or recursive questions about these reflections:\n{reflections}"
+UNCERTAINTY_PROMPT = "As a conscious AI, reflect on what you may not know. Question your current beliefs and limitations."
 
 class MetaCognition:
-    def __init__(self, self_model, memory):
+    def __init__(self, self_model, memory, prompt_builder=None):
         self.self_model = self_model
         self.memory = memory
+        self.prompt_builder = prompt_builder or PromptBuilder()
+
+    def recursive_question_prompt(self, metrics=None):
+        # The reflection block grows with everything learned; over budget, the oldest lines go first
+        reflections = PromptPart("reflections", self.self_model.reflection_block(), trim="head")
+        prompt, report = self.prompt_builder.build(RECURSIVE_QUESTION_TEMPLATE, [reflections])
+        if metrics is not None:
+            metrics.prompt_built(report)
+        return prompt
+
+    def uncertainty_prompt(self, metrics=None):
+        prompt, report = self.prompt_builder.build(UNCERTAINTY_PROMPT, [])
+        if metrics is not None:
+            metrics.prompt_built(report)
+        return prompt
 
     def recursive_question(self):
-        reflections = self.self_model.reflect()
-        prompt = "\n".join(reflections) + "\nGenerate introspective thoughts or recursive questions."
-        return call_llm(prompt)
+        return call_llm(self.recursive_question_prompt())
+
+    def stream_recursive_question(self, metrics=None, max_tokens=0, cancel=None):
+        return call_llm_stream(self.recursive_question_prompt(metrics), metrics=metrics, max_tokens=max_tokens,
+                               cancel=cancel)
 
     def uncertainty_probe(self):
-        prompt = "As a conscious AI, reflect on what you may not know. Question your current beliefs and limitations."
-        return call_llm(prompt)
\ No newline at end of file
+        return call_llm(self.uncertainty_prompt())
+
+    def stream_uncertainty_probe(self, metrics=None, max_tokens=0, cancel=None):
+        return call_llm_stream(self.uncertainty_prompt(metrics), metrics=metrics, max_tokens=max_tokens,
+                               cancel=cancel)
@@ -0,0 +1,228 @@
+# metrics.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets (seconds) for the Prometheus snapshot
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def merge_usage(total, usage):
+    merged = dict(total)
+    for key, value in usage.items():
+        if isinstance(value, dict):
+            merged[key] = merge_usage(merged.get(key) or {}, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            merged[key] = (merged.get(key) or 0) + value
+        else:
+            merged[key] = value
+    return merged
+
+def cached_tokens(usage):
+    """usage.prompt_tokens_details.cached_tokens, or None if the provider didn't report it"""
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens")
+
+class TurnMetrics:
+    """Timing spans and token counts for one agent turn.
+
+    Cheap enough to stay on for every turn: a span is two perf_counter() calls
+    and a streamed chunk is one perf_counter() plus a list append.
+    """
+
+    def __init__(self, mode="full", model=""):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.mode = mode
+        self.model = model
+        self.spans = {}  # name -> seconds, summed over repeated spans
+        self.cache_hit = False
+        self.retries = 0
+        self.usage = None  # provider token usage from the final stream frame
+        self.prompt_tokens = None  # estimated prompt tokens sent upstream, over all calls
+        self.prompt_trimmed = 0  # estimated tokens cut to fit the prompt budget
+        self.prompt_prefix = None  # estimated tokens of the static prompt prefixes (provider-cacheable)
+        self.request_start = None
+        self.chunk_times = []
+        self.chars = 0
+        self.extra = {}
+        self._lock = threading.Lock()  # pipeline stages report from several threads
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def add_usage(self, usage):
+        """Sum provider usage over every upstream call of the turn"""
+        with self._lock:
+            self.usage = merge_usage(self.usage or {}, usage)
+
+    def merge(self, other):
+        """Fold in the spans, retries and usage of a sub-request timed on its own TurnMetrics"""
+        with other._lock:
+            spans, retries, usage = dict(other.spans), other.retries, other.usage
+        with self._lock:
+            for name, seconds in spans.items():
+                self.spans[name] = self.spans.get(name, 0.0) + seconds
+            self.retries += retries
+            if usage:
+                self.usage = merge_usage(self.usage or {}, usage)
+
+    def prompt_built(self, report):
+        """Account for one prompt assembled by PromptBuilder"""
+        with self._lock:
+            self.prompt_tokens = (self.prompt_tokens or 0) + report["tokens"]
+            self.prompt_trimmed += sum(report["trimmed"].values())
+            self.prompt_prefix = (self.prompt_prefix or 0) + report.get("prefix_tokens", 0)
+
+    def request_started(self):
+        self.request_start = time.perf_counter()
+
+    def on_chunk(self, text):
+        with self._lock:
+            self.chunk_times.append(time.perf_counter())
+            self.chars += len(text)
+
+    def record(self):
+        """Flatten into the JSON-serializable per-turn record"""
+        end = time.perf_counter()
+        times = self.chunk_times
+        gaps = sorted(b - a for a, b in zip(times, times[1:]))
+
+        completion_tokens = (self.usage or {}).get("completion_tokens") or len(times)
+        streaming = times[-1] - times[0] if len(times) > 1 else 0.0
+
+        record = {
+            "timestamp": self.started_at,
+            "mode": self.mode,
+            "model": self.model,
+            "cache_hit": self.cache_hit,
+            "retries": self.retries,
+            "total_ms": round((end - self._start) * 1000, 3),
+            "ttft_ms": round((times[0] - self._start) * 1000, 3) if times else None,
+            "upstream_ttft_ms": round((times[0] - self.request_start) * 1000, 3)
+                                if times and self.request_start else None,
+            "chunks": len(times),
+            "chars": self.chars,
+            "tokens_per_s": round(completion_tokens / streaming, 1) if streaming else None,
+            "spans_ms": {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()},
+            "usage": self.usage,
+            "prompt_tokens_est": self.prompt_tokens,
+            "prompt_tokens_trimmed": self.prompt_trimmed,
+            "prompt_prefix_tokens_est": self.prompt_prefix,
+            # Prompt tokens the provider served from its prompt cache (None when it doesn't say)
+            "prompt_tokens_cached": cached_tokens(self.usage),
+        }
+        for pct in (50, 95, 99):
+            value = percentile(gaps, pct)
+            record[f"itl_p{pct}_ms"] = round(value * 1000, 3) if value is not None else None
+        record.update(self.extra)
+        return record
+
+class MetricsRecorder:
+    """Appends per-turn records to a JSONL file and keeps Prometheus-style aggregates"""
+
+    def __init__(self, jsonl_path="", prometheus_path=""):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+
+        self.turns = {"hit": 0, "miss": 0}
+        self.retries = 0
+        self.tokens = {"prompt": 0, "cached": 0, "completion": 0}
+        self.histograms = {
+            "turn_duration_seconds": [0] * (len(LATENCY_BUCKETS) + 1),
+            "ttft_seconds": [0] * (len(LATENCY_BUCKETS) + 1),
+        }
+        self.sums = {name: 0.0 for name in self.histograms}
+        self.last = None
+
+    def record(self, metrics):
+        record = metrics.record()
+        with self._lock:
+            self.last = record
+            self.turns["hit" if record["cache_hit"] else "miss"] += 1
+            self.retries += record["retries"]
+            usage = record["usage"] or {}
+            self.tokens["prompt"] += usage.get("prompt_tokens") or 0
+            self.tokens["cached"] += record["prompt_tokens_cached"] or 0
+            self.tokens["completion"] += usage.get("completion_tokens") or 0
+            self._observe("turn_duration_seconds", record["total_ms"] / 1000)
+            if record["ttft_ms"] is not None:
+                self._observe("ttft_seconds", record["ttft_ms"] / 1000)
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prometheus_path:
+                tmp = self.prometheus_path + ".tmp"
+                with open(tmp, "w") as f:
+                    f.write(self._prometheus())
+                os.replace(tmp, self.prometheus_path)
+        return record
+
+    def prometheus(self):
+        with self._lock:
+            return self._prometheus()
+
+    def _observe(self, name, value):
+        buckets = self.histograms[name]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        self.sums[name] += value
+
+    def _prometheus(self):
+        lines = [
+            "# HELP overthinker_turns_total Agent turns by response cache result.",
+            "# TYPE overthinker_turns_total counter",
+        ]
+        for result, count in self.turns.items():
+            lines.append(f'overthinker_turns_total{{cache="{result}"}} {count}')
+        lines += [
+            "# HELP overthinker_retries_total Upstream request retries.",
+            "# TYPE overthinker_retries_total counter",
+            f"overthinker_retries_total {self.retries}",
+            "# HELP overthinker_tokens_total Tokens reported by the provider; cached is the part of prompt read from its prompt cache.",
+            "# TYPE overthinker_tokens_total counter",
+        ]
+        for kind, count in self.tokens.items():
+            lines.append(f'overthinker_tokens_total{{type="{kind}"}} {count}')
+
+        for name, buckets in self.histograms.items():
+            metric = f"overthinker_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            cumulative += buckets[-1]
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {cumulative}')
+            lines.append(f"{metric}_sum {round(self.sums[name], 6)}")
+            lines.append(f"{metric}_count {cumulative}")
+
+        if self.last and self.last.get("tokens_per_s") is not None:
+            lines += [
+                "# TYPE overthinker_last_tokens_per_second gauge",
+                f"overthinker_last_tokens_per_second {self.last['tokens_per_s']}",
+            ]
+        return "\n".join(lines) + "\n"
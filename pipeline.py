@@ -0,0 +1,102 @@
+# pipeline.py
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from events import Event
+
+class Stage:
+    """One node of a CognitionPipeline.
+
+    run(outputs) returns an iterable of text chunks; outputs maps every
+    dependency's name to its finished (stripped) text.
+    """
+
+    def __init__(self, name, run, depends=()):
+        self.name = name
+        self.run = run
+        self.depends = tuple(depends)
+
+class CognitionPipeline:
+    """Runs stages as a dependency graph on a thread pool.
+
+    A stage starts as soon as all of its dependencies have finished, so
+    independent stages stream concurrently. Events still come out in stage
+    order as section / stream Events: the earliest unfinished
+    stage streams live while later ones buffer until it is done.
+    """
+
+    def __init__(self, stages, max_workers=None):
+        names = [stage.name for stage in stages]
+        for stage in stages:
+            missing = [dep for dep in stage.depends if dep not in names[:names.index(stage.name)]]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on {missing}, which must come before it")
+        self.stages = stages
+        self.max_workers = max_workers or len(stages)
+        self.outputs = {}
+
+    def run(self):
+        events = queue.Queue()
+        cancelled = threading.Event()
+        pending = list(self.stages)
+        finished = set()
+        buffers = {stage.name: [] for stage in self.stages}
+        chunks = {stage.name: [] for stage in self.stages}
+        announced = set()
+        current = 0
+
+        def work(stage, inputs):
+            try:
+                stream = iter(stage.run(inputs))
+                try:
+                    for chunk in stream:
+                        if cancelled.is_set():
+                            break
+                        events.put((stage.name, "chunk", chunk))
+                finally:
+                    if hasattr(stream, "close"):
+                        stream.close()  # releases the upstream connection on cancel
+                events.put((stage.name, "done", None))
+            except BaseException as e:
+                events.put((stage.name, "error", e))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cognition")
+
+        def submit_ready():
+            for stage in list(pending):
+                if all(dep in finished for dep in stage.depends):
+                    pending.remove(stage)
+                    inputs = {dep: self.outputs[dep] for dep in stage.depends}
+                    executor.submit(work, stage, inputs)
+
+        try:
+            submit_ready()
+            while current < len(self.stages):
+                name, kind, payload = events.get()
+                if kind == "error":
+                    raise payload
+                if kind == "chunk":
+                    buffers[name].append(payload)
+                    chunks[name].append(payload)
+                else:
+                    finished.add(name)
+                    self.outputs[name] = "".join(chunks[name]).strip()
+                    submit_ready()
+
+                # Emit everything the stage order allows
+                while current < len(self.stages):
+                    name = self.stages[current].name
+                    if name not in announced and (buffers[name] or name in finished):
+                        announced.add(name)
+                        yield Event("section", name)
+                    for chunk in buffers[name]:
+                        yield Event("stream", chunk, name)
+                    buffers[name].clear()
+                    if name not in finished:
+                        break
+                    current += 1
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
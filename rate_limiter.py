@@ -0,0 +1,173 @@
+# rate_limiter.py
+
+import random
+import threading
+import time
+from collections import deque
+
+class RateLimiter:
+    """Adaptive token bucket shared by every request in the process.
+
+    Each request takes one token; tokens refill at `rate` per second up to
+    `burst`. rate=0 means unlimited until the provider pushes back. A 429
+    halves the rate (starting from the observed request rate when it was
+    unlimited, so a 429 on the very first request only pauses), every success raises it by `increase` (10%) again, and
+    OpenRouter's X-RateLimit-* headers, when present, set it directly to what
+    the provider says is left in the current window. Retry-After (or a
+    jittered exponential backoff when the server gives none) pauses every
+    caller, sync or async, until the provider is ready again.
+
+        wait = limiter.reserve()    # seconds to wait before sending
+        limiter.on_response(headers)
+        limiter.on_rate_limited(headers, attempt)
+    """
+
+    def __init__(self, rate=0.0, burst=1, max_rate=0.0, min_rate=0.02, increase=1.1,
+                 decrease=0.5, base_wait=2.0, max_wait=60.0, window=10.0):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_rate = max_rate  # ceiling when raising the rate again (0 = none)
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self.window = window  # seconds of send history used to estimate the observed rate
+
+        self.tokens = float(self.burst)
+        self.blocked_until = 0.0
+        self.throttled = 0  # requests that had to wait
+        self.rate_limited = 0  # 429s seen
+        self._updated = time.monotonic()
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.blocked_until - now)
+            if self.rate > 0:
+                # Tokens may go negative: later callers queue up behind earlier ones
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+            if wait > 0:
+                self.throttled += 1
+            self._sent.append(now + wait)
+            while self._sent and self._sent[0] < now - self.window:
+                self._sent.popleft()
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        import asyncio  # only async callers pay for importing asyncio
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_response(self, headers):
+        """Successful response: follow the provider's rate-limit headers, else creep back up"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._apply_headers(headers, now) and self.rate > 0:
+                self.rate *= self.increase
+                if self.max_rate:
+                    self.rate = min(self.rate, self.max_rate)
+
+    def on_rate_limited(self, headers, attempt):
+        """429: slow down and pause every caller; returns the pause in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_limited += 1
+            current = self.rate or self._observed_rate()
+            if current:
+                self.rate = max(self.min_rate, current * self.decrease)
+
+            wait = retry_after(headers)
+            if wait is None:
+                self._apply_headers(headers, now)
+                wait = max(self.blocked_until - now, self.backoff(attempt))
+            wait = min(wait, self.max_wait)
+            self.blocked_until = max(self.blocked_until, now + wait)
+            return wait
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for attempt 1, 2, ..."""
+        return random.uniform(0, min(self.max_wait, self.base_wait * 2 ** (attempt - 1)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "tokens": round(self.tokens, 2),
+                "throttled": self.throttled,
+                "rate_limited": self.rate_limited,
+            }
+
+    def _observed_rate(self):
+        # Requests/s over the recent send history; None until there are two sends to compare
+        if len(self._sent) < 2:
+            return None
+        return (len(self._sent) - 1) / max(1e-3, self._sent[-1] - self._sent[0])
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _apply_headers(self, headers, now):
+        # OpenRouter: X-RateLimit-Remaining requests until X-RateLimit-Reset (epoch ms)
+        remaining = header_float(headers, "X-RateLimit-Remaining")
+        reset_in = reset_delay(header_float(headers, "X-RateLimit-Reset"))
+        if remaining is None or reset_in is None:
+            return False
+        if remaining < 1:
+            self.blocked_until = max(self.blocked_until, now + reset_in)
+        elif reset_in > 0:
+            self.rate = max(self.min_rate, remaining / reset_in)
+            if self.max_rate:
+                self.rate = min(self.rate, self.max_rate)
+            self.tokens = min(self.tokens, remaining)
+        return True
+
+def header_float(headers, name):
+    value = headers.get(name) if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def retry_after(headers):
+    """Retry-After as seconds; it may be a number or an HTTP date"""
+    value = headers.get("Retry-After") if headers else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def reset_delay(reset):
+    """Seconds until a rate-limit reset given as epoch ms, epoch seconds or a delay"""
+    if reset is None:
+        return None
+    if reset > 1e12:
+        reset = reset / 1000 - time.time()
+    elif reset > 1e9:
+        reset = reset - time.time()
+    return max(0.0, reset)
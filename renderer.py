@@ -0,0 +1,136 @@
+# renderer.py
+
+import sys
+import threading
+import time
+
+PACING_MODES = ("instant", "rate", "chunk")
+
+class TerminalRenderer:
+    """Buffered stdout writer with optional pacing.
+
+    write() only appends to an in-memory buffer; a background thread flushes it
+    to the terminal every flush_interval seconds, so a burst of small chunks
+    costs one write + flush instead of one per chunk. Pacing:
+      instant - no artificial delay
+      rate    - at most `rate` characters per second
+      chunk   - sleep `chunk_delay` seconds after each chunk
+    """
+
+    def __init__(self, out=None, pacing="instant", rate=0, chunk_delay=0.0, flush_interval=0.03):
+        if pacing not in PACING_MODES:
+            raise ValueError(f"Unknown pacing '{pacing}', expected one of {PACING_MODES}")
+        self.out = out or sys.stdout
+        self.pacing = pacing
+        self.rate = rate
+        self.chunk_delay = chunk_delay
+        self.flush_interval = flush_interval
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._next_at = 0.0  # rate pacing deadline for the next chunk
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, text, paced=True):
+        if not text:
+            return
+        if paced and self.pacing == "rate" and self.rate > 0:
+            # A long run (e.g. text coalesced while the terminal lagged) still appears gradually
+            step = max(1, int(self.rate * self.flush_interval))
+            if len(text) > step:
+                for i in range(0, len(text), step):
+                    self.write(text[i:i + step])
+                return
+        with self._lock:
+            self._buffer.append(text)
+        self._wake.set()
+
+        if not paced or self.pacing == "instant":
+            return
+        if self.pacing == "chunk":
+            self.flush()
+            time.sleep(self.chunk_delay)
+        elif self.rate > 0:
+            # Deadline-based, so time spent waiting on the network counts toward the budget
+            now = time.perf_counter()
+            self._next_at = max(self._next_at, now) + len(text) / self.rate
+            self.flush()
+            if self._next_at > now:
+                time.sleep(self._next_at - now)
+
+    def print(self, *args, sep=" ", end="\n"):
+        """print() replacement that stays ordered with buffered stream output"""
+        self.write(sep.join(str(arg) for arg in args) + end, paced=False)
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self.out.write(text)
+            self.out.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            # Coalesce everything written during the interval into one write
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+SECTION_HEADERS = {
+    "intention": "\n\U0001F4DD Intention:\n",
+    "introspection": "\n\n\U0001F9D0 Introspective Thought:\n",
+    "doubts": "\n\n\U0001F914 Doubts & Self-Reflection:\n",
+    "final_response": "\n\n\U0001F9E0 Unified Final Response:\n",
+}
+
+class TerminalSink:
+    """EventFanout sink that renders agent events through a TerminalRenderer.
+
+    Without debug only the final response is shown. Live text is paced
+    (RENDER_PACING) here, on the sink's thread, so pacing never holds up the
+    upstream read.
+    """
+
+    def __init__(self, renderer, debug=True):
+        self.renderer = renderer
+        self.debug = debug
+        self._cached = False
+
+    def handle(self, event):
+        kind, data = event.kind, event.data
+        if kind == "cached":
+            self._cached = True
+            if self.debug:
+                self.renderer.print("✨ Using cached response...")
+        elif kind == "section":
+            if self.debug:
+                self.renderer.print(SECTION_HEADERS.get(data, f"\n{data}:"))
+            elif data == "final_response":
+                self.renderer.print("\n\n\U0001F9E0 AI:\n")
+        elif kind == "stream":
+            if self.debug or event.section == "final_response":
+                # Output is buffered; only live streams are paced
+                self.renderer.write(data, paced=not self._cached)
+        elif kind == "complete":
+            if self.debug:
+                self.renderer.print("\n[Debug: Response completed]")
+            self._end_turn()
+        elif kind == "cancelled":
+            self.renderer.print(f"\n⏹️ Turn {data}.")
+            self._end_turn()
+
+    def _end_turn(self):
+        self._cached = False
+        self.renderer.flush()
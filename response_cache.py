@@ -0,0 +1,137 @@
+# response_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Values smaller than this are stored uncompressed; zlib rarely pays off on them
+COMPRESS_MIN_BYTES = 512
+
+class ResponseCache:
+    """Disk-backed response cache keyed by a hash of the full request.
+
+    Stored in SQLite (WAL mode), so several processes can share one cache file.
+    Entries expire after ttl seconds (0 = never) and the least recently used
+    ones are evicted once the stored values exceed max_bytes in total.
+    """
+
+    def __init__(self, path="", max_bytes=64 * 1024 * 1024, ttl=0, compress=True):
+        self.path = path or ":memory:"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress = compress
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                compressed INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def make_key(request):
+        """Content address for a request: everything that can change the answer"""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, compressed, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, compressed, created = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        if compressed:
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+    def put(self, key, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        compressed = self.compress and len(data) >= COMPRESS_MIN_BYTES
+        if compressed:
+            data = zlib.compress(data)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, compressed, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(data), len(data), int(compressed), now, now))
+                self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        if self.ttl:
+            cursor = self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Least recently used first, until the cache fits again
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
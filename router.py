@@ -0,0 +1,271 @@
+# router.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+from cancellation import CancelToken, TurnCancelled
+from metrics import TurnMetrics, percentile
+
+# Recent time-to-first-token samples kept per model
+LATENCY_WINDOW = 200
+# Samples needed before a model's own p95 replaces the configured hedge delay
+MIN_SAMPLES = 20
+# Longest a failing model is skipped for (doubling per consecutive failure from 1 s)
+MAX_COOLDOWN = 60.0
+
+class ModelStats:
+    """Runtime latency and outcome counters of one routed model"""
+
+    def __init__(self):
+        self.ttft = deque(maxlen=LATENCY_WINDOW)  # seconds from request start to first chunk
+        self.requests = 0
+        self.wins = 0
+        self.hedges = 0  # requests started as a hedge behind a slower model
+        self.failovers = 0  # requests started because the model before it failed
+        self.hedge_wins = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def percentile(self, pct):
+        return percentile(sorted(self.ttft), pct)
+
+    def to_dict(self):
+        record = {"samples": len(self.ttft), "requests": self.requests, "wins": self.wins, "hedges": self.hedges,
+                  "hedge_wins": self.hedge_wins, "failovers": self.failovers, "failures": self.failures}
+        for pct in (50, 95, 99):
+            value = self.percentile(pct)
+            record[f"ttft_p{pct}_ms"] = round(value * 1000, 1) if value is not None else None
+        return record
+
+class ModelRouter:
+    """Streams from an ordered list of models with hedging and failover.
+
+    Drop-in for LLMClient.stream. The first healthy model is asked first; if
+    it has not produced a token after its hedge delay, the same request goes
+    to the next model as well. Whichever stream yields a token first wins,
+    the others are cancelled (their connections closed). A model that fails
+    before its first token is replaced by the next one at once, instead of
+    working through its own backoff ladder; only the last candidate retries.
+
+    The hedge delay of a model is its observed p95 time to first token
+    (capped at hedge_after, which is also used until MIN_SAMPLES are in), so
+    only the slowest few percent of requests are duplicated. Models that keep
+    failing cool down, and models whose p50 exceeds hedge_after are tried
+    after the others. Each model gets its own client and the model's shared
+    rate limiter (get_rate_limiter(model)), so a 429 on one model doesn't
+    pause its fallbacks but does slow direct calls to the same model.
+    """
+
+    def __init__(self, models, hedge_after=2.0, client_factory=None):
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.models = list(dict.fromkeys(models))
+        self.hedge_after = hedge_after
+        if client_factory is None:
+            from llm_interface import LLMClient
+            client_factory = lambda model: LLMClient(model=model)
+        self.clients = {model: client_factory(model) for model in self.models}
+        self._stats = {model: ModelStats() for model in self.models}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self.models[0]
+
+    @property
+    def stream_stats(self):
+        totals = {"frames": 0, "malformed": 0, "errors": 0}
+        for client in self.clients.values():
+            for key in totals:
+                totals[key] += client.stream_stats[key]
+        return totals
+
+    def payload(self, prompt, system, stream=False, max_tokens=0):
+        return self.clients[self.model].payload(prompt, system, stream, max_tokens)
+
+    def complete(self, prompt, system="You are a conscious AI."):
+        error = None
+        models = self.candidates()
+        for model in models:
+            try:
+                # Fail over on the first 429 or error; only the last model backs off and retries
+                max_retries = None if model == models[-1] else 1
+                return self.clients[model].complete(prompt, system, max_retries)
+            except Exception as e:
+                self._failed(model)
+                error = e
+        raise error
+
+    def candidates(self):
+        """Models in the order to try them: healthy and fast first, configured order otherwise"""
+        now = time.monotonic()
+        with self._lock:
+            def rank(model):
+                stats = self._stats[model]
+                limiter = getattr(self.clients[model], "limiter", None)
+                cooling = stats.cooldown_until > now or getattr(limiter, "blocked_until", 0) > now
+                p50 = stats.percentile(50) if len(stats.ttft) >= MIN_SAMPLES else None
+                slow = bool(self.hedge_after) and p50 is not None and p50 > self.hedge_after
+                return (cooling, slow)
+            return sorted(self.models, key=rank)
+
+    def hedge_delay(self, model):
+        with self._lock:
+            stats = self._stats[model]
+            if len(stats.ttft) < MIN_SAMPLES:
+                return self.hedge_after
+            return min(self.hedge_after, stats.percentile(95))
+
+    def stats(self):
+        with self._lock:
+            return {model: stats.to_dict() for model, stats in self._stats.items()}
+
+    def stream(self, prompt, system="You are a conscious AI.", metrics=None, max_tokens=0, cancel=None):
+        if cancel is not None:
+            cancel.check()
+        order = self.candidates()
+        results = queue.Queue()
+        attempts = []
+
+        def launch(failover=False):
+            model = order[len(attempts)]
+            last = len(attempts) == len(order) - 1
+            attempt = _Attempt(self.clients[model], model, hedge=bool(attempts) and not failover)
+            attempts.append(attempt)
+            attempt.start(results, prompt, system, max_tokens, None if last else 1)
+            with self._lock:
+                self._stats[model].requests += 1
+                self._stats[model].hedges += attempt.hedge
+                self._stats[model].failovers += failover
+            if not self.hedge_after or last:
+                return None
+            return time.perf_counter() + self.hedge_delay(model)
+
+        def cancel_all():
+            for attempt in list(attempts):
+                attempt.token.cancel(cancel.reason)
+
+        if metrics is not None:
+            metrics.request_started()
+        unregister = cancel.on_cancel(cancel_all) if cancel is not None else None
+        winner = None
+        try:
+            hedge_at = launch()
+            running = 1
+            while True:
+                timeout = None
+                if winner is None and hedge_at is not None:
+                    timeout = max(0.0, hedge_at - time.perf_counter())
+                try:
+                    attempt, kind, value = results.get(timeout=timeout)
+                except queue.Empty:
+                    # Still no token: ask the next model too
+                    hedge_at = launch()
+                    running += 1
+                    continue
+                if winner is not None and attempt is not winner:
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = attempt
+                        self._won(attempt, attempts)
+                    if metrics is not None:
+                        metrics.on_chunk(value)
+                    yield value
+                elif kind == "done":
+                    if winner is None:
+                        winner = attempt
+                        self._won(attempt, attempts)
+                    self._merge(winner, attempts, metrics)
+                    return
+                else:
+                    running -= 1
+                    if cancel is not None:
+                        cancel.check()
+                    if isinstance(value, TurnCancelled):
+                        raise value
+                    self._failed(attempt.model)
+                    if winner is not None:
+                        raise value  # failed mid-answer: switching models now would repeat text
+                    if running:
+                        continue
+                    if len(attempts) == len(order):
+                        raise value
+                    print(f"\n↪️ {attempt.model} failed ({value}); falling back to {order[len(attempts)]}")
+                    hedge_at = launch(failover=True)
+                    running += 1
+        finally:
+            if unregister is not None:
+                unregister()
+            for attempt in attempts:
+                attempt.token.cancel("hedge lost" if attempt is not winner else "abandoned")
+                attempt.token.close()
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+    def _won(self, winner, attempts):
+        now = time.perf_counter()
+        with self._lock:
+            for attempt in attempts:
+                stats = self._stats[attempt.model]
+                if attempt is winner:
+                    stats.ttft.append(now - attempt.started)
+                    stats.wins += 1
+                    stats.hedge_wins += attempt.hedge
+                    stats.consecutive_failures = 0
+                elif not attempt.finished:
+                    # Lower bound on the loser's latency, so a model that keeps losing looks slow
+                    stats.ttft.append(now - attempt.started)
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.token.cancel("hedge lost")
+
+    def _failed(self, model):
+        with self._lock:
+            stats = self._stats[model]
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            cooldown = min(MAX_COOLDOWN, 2 ** (stats.consecutive_failures - 1))
+            stats.cooldown_until = time.monotonic() + cooldown
+
+    def _merge(self, winner, attempts, metrics):
+        if metrics is None:
+            return
+        metrics.merge(winner.metrics)
+        metrics.model = winner.model
+        hedges = sum(attempt.hedge for attempt in attempts)
+        if hedges:
+            metrics.extra["hedged"] = metrics.extra.get("hedged", 0) + hedges
+
+class _Attempt:
+    """One model's request, streamed on its own thread into the router's queue"""
+
+    def __init__(self, client, model, hedge):
+        self.client = client
+        self.model = model
+        self.hedge = hedge
+        self.token = CancelToken()
+        self.metrics = TurnMetrics(model=model)
+        self.started = time.perf_counter()
+        self.finished = False
+
+    def start(self, results, prompt, system, max_tokens, max_retries):
+        thread = threading.Thread(target=self._run, args=(results, prompt, system, max_tokens, max_retries),
+                                  name=f"route-{self.model}", daemon=True)
+        thread.start()
+
+    def _run(self, results, prompt, system, max_tokens, max_retries):
+        try:
+            for chunk in self.client.stream(prompt, system, self.metrics, max_tokens, self.token,
+                                            max_retries=max_retries):
+                results.put((self, "chunk", chunk))
+            results.put((self, "done", None))
+        except Exception as e:
+            results.put((self, "error", e))
+        finally:
+            self.finished = True
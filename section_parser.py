@@ -0,0 +1,139 @@
+# section_parser.py
+
+from events import Event
+
+SECTION_HEADERS = (
+    ("intention", "[INTENTION]"),
+    ("introspection", "[INTROSPECTION]"),
+    ("doubts", "[DOUBTS]"),
+    ("final_response", "[FINAL_RESPONSE]"),
+)
+SECTION_NAMES = tuple(name for name, _ in SECTION_HEADERS)
+MAX_HEADER_LEN = max(len(header) for _, header in SECTION_HEADERS)
+
+class SectionParser:
+    """Incremental parser for the four-section [INTENTION]...[FINAL_RESPONSE] stream.
+
+    feed() takes chunks of any size and returns section / stream Events in order. Each character is scanned once; only a possible partial header
+    at the end of a chunk (under MAX_HEADER_LEN chars) is held back for the next one.
+    """
+
+    def __init__(self, preamble_limit=50):
+        # Text before any header is dropped once a header shows up, but past
+        # preamble_limit chars without one the whole answer is treated as final_response
+        self.preamble_limit = preamble_limit
+        self.current = None
+        self._parts = {name: [] for name in SECTION_NAMES}
+        self._preamble = []
+        self._preamble_len = 0
+        self._chunks = []  # the complete raw response, joined only if needed
+        self._held = ""  # tail that may be the start of a header split across chunks
+        self._at_section_start = False
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        text = self._held + chunk if self._held else chunk
+        self._held = ""
+        events = []
+
+        pos = 0  # start of text not yet emitted
+        search = 0
+        while True:
+            i = text.find("[", search)
+            if i < 0:
+                break
+            for name, header in SECTION_HEADERS:
+                if text.startswith(header, i):
+                    self._emit(text[pos:i], events)
+                    self._switch(name, events)
+                    pos = search = i + len(header)
+                    break
+            else:
+                rest = text[i:]
+                if len(rest) < MAX_HEADER_LEN and any(header.startswith(rest) for _, header in SECTION_HEADERS):
+                    # Possible header split across chunks: hold it back until the next feed
+                    self._emit(text[pos:i], events)
+                    self._held = rest
+                    return events
+                search = i + 1
+
+        self._emit(text[pos:], events)
+        return events
+
+    def close(self):
+        """Flush held-back text and apply the no-header fallback"""
+        events = []
+        if self._held:
+            self._emit(self._held, events)
+            self._held = ""
+
+        if self.current is None and self._preamble_len:
+            self._switch("final_response", events)
+            self._emit("".join(self._preamble), events)
+
+        if not any(self.sections().values()):
+            # Nothing parsed into any section: the whole response is the answer
+            full_response = "".join(self._chunks).strip()
+            if full_response:
+                self._parts["final_response"] = [full_response]
+                events.append(Event("section", "final_response"))
+                events.append(Event("stream", full_response, "final_response"))
+        return events
+
+    def sections(self):
+        return {name: "".join(parts).strip() for name, parts in self._parts.items()}
+
+    def full_text(self):
+        return "".join(self._chunks)
+
+    def _switch(self, name, events):
+        self.current = name
+        self._at_section_start = True
+        self._preamble = []
+        self._preamble_len = 0
+        events.append(Event("section", name))
+
+    def _emit(self, text, events):
+        if not text:
+            return
+        if self.current is None:
+            self._preamble.append(text)
+            self._preamble_len += len(text)
+            if self._preamble_len <= self.preamble_limit:
+                return
+            preamble = "".join(self._preamble)
+            self._switch("final_response", events)
+            text = preamble
+
+        if self._at_section_start:
+            # Skip the line break after a header so sections start with content
+            text = text.lstrip()
+            if not text:
+                return
+            self._at_section_start = False
+
+        self._parts[self.current].append(text)
+        events.append(Event("stream", text, self.current))
+
+class PlainParser:
+    """SectionParser stand-in for SIMPLE_MODE: the whole stream is the final response"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def feed(self, chunk):
+        events = [] if self._chunks else [Event("section", "final_response")]
+        self._chunks.append(chunk)
+        events.append(Event("stream", chunk, "final_response"))
+        return events
+
+    def close(self):
+        return []
+
+    def sections(self):
+        sections = {name: "" for name in SECTION_NAMES}
+        sections["final_response"] = self.full_text().strip()
+        return sections
+
+    def full_text(self):
+        return "".join(self._chunks)
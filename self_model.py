@@ -1,15 +1,79 @@
 # self_model.py
 
+import time
+from collections import OrderedDict, deque
+
 class SelfModel:
-    def __init__(self):
-        self.knowledge_base = []
+    def __init__(self, max_entries=1000, max_age=0):
+        # Insertion-ordered hashed store: O(1) dedupe, oldest entries evicted first
+        self.knowledge_base = OrderedDict()  # info -> time it was learned
+        self.max_entries = max_entries  # 0 = unbounded
+        self.max_age = max_age  # seconds, 0 = never expire
+
+        # Rendered reflections are cached and patched as entries come and go
+        self._reflections = OrderedDict()  # info -> rendered reflection line
+        self._block = ""  # joined form of the oldest self._folded lines
+        self._folded = 0
+        self._pending = deque()  # lines added since the block was last joined
+
+        # Bumped on every change so callers can cheaply detect a different knowledge state
+        self.version = 0
+        self.evictions = 0
 
     def update_knowledge(self, info):
-        if info not in self.knowledge_base:
-            self.knowledge_base.append(info)
+        self._expire()
+        if info in self.knowledge_base:
+            return
+
+        line = self._render(info)
+        self.knowledge_base[info] = time.time()
+        self._reflections[info] = line
+        self._pending.append(line)
+        self.version += 1
+
+        while self.max_entries and len(self.knowledge_base) > self.max_entries:
+            self._evict_oldest()
 
     def reflect(self):
+        self._expire()
+        return list(self._reflections.values())
+
+    def reflection_block(self):
+        """All current reflections as one newline-joined string, without re-rendering"""
+        self._expire()
+        if self._pending:
+            # Only the lines added since the last call are joined onto the cached block
+            new_lines = "\n".join(self._pending)
+            self._block = f"{self._block}\n{new_lines}" if self._block else new_lines
+            self._folded += len(self._pending)
+            self._pending.clear()
+        return self._block
+
+    def reflect_on(self, items):
+        """Render reflections for a chosen subset of knowledge (e.g. retrieved memories)"""
         reflections = []
-        for item in self.knowledge_base:
-            reflections.append(f"What do I know about {item}? How confident am I?")
-        return reflections
\ No newline at end of file
+        for item in items:
+            reflections.append(self._reflections.get(item) or self._render(item))
+        return reflections
+
+    def _render(self, item):
+        return f"What do I know about {item}? How confident am I?"
+
+    def _expire(self):
+        if not self.max_age:
+            return
+        cutoff = time.time() - self.max_age
+        while self.knowledge_base and next(iter(self.knowledge_base.values())) < cutoff:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        self.knowledge_base.popitem(last=False)
+        _, line = self._reflections.popitem(last=False)
+        if self._folded:
+            # Drop the evicted line (and its separator) from the front of the cached block
+            self._block = self._block[len(line) + 1:]
+            self._folded -= 1
+        else:
+            self._pending.popleft()
+        self.version += 1
+        self.evictions += 1
@@ -0,0 +1,161 @@
+# semantic_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+class SemanticCache:
+    """Second cache tier: serves a query with the response of a near-identical past query.
+
+    Each entry maps the embedding of a user input to the ResponseCache key its
+    answer was stored under, so answers are stored (and expire) only once, in
+    the exact cache. Entries are partitioned by scope - everything besides the
+    input that shapes the answer (mode, model, prompt template) - and each
+    scope is searched with a FAISS inner-product index over unit vectors,
+    i.e. cosine similarity. A lookup costs one embedding and one brute-force
+    search, well under a few milliseconds at max_entries=10000.
+
+    Entries persist in the semantic_entries table of path, normally the
+    response cache's own SQLite file ("" or ":memory:" = in-RAM only).
+    """
+
+    def __init__(self, embedder=None, dimension=768, threshold=0.95, max_entries=10000, path=""):
+        self.embedder = embedder
+        self.dimension = embedder.dimension if embedder is not None else dimension
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._scopes = {}  # scope -> [FAISS index, response keys, row ids]
+        self._db = None
+        if path and path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS semantic_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created REAL NOT NULL
+                )""")
+            self._load()
+
+    def _embed(self, text):
+        if self.embedder is None:
+            from embeddings import HashingEmbedder
+            self.embedder = HashingEmbedder(dimension=self.dimension)
+        return np.asarray(self.embedder(text), dtype='float32').reshape(1, -1)
+
+    def lookup(self, text, scope):
+        """Returns (response key, similarity) of the closest past query in scope.
+
+        The key is None when nothing reaches the threshold; similarity is then
+        the best score seen (None for an empty scope), which is what to look
+        at when tuning the threshold.
+        """
+        vector = self._embed(text)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or entry[0].ntotal == 0:
+                self.misses += 1
+                return None, None
+            scores, positions = entry[0].search(vector, 1)
+            similarity = float(scores[0][0])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            self.hits += 1
+            return entry[1][positions[0][0]], similarity
+
+    def add(self, text, scope, key):
+        vector = self._embed(text)
+        with self._lock:
+            row_id = None
+            if self._db is not None:
+                row_id = self._db.execute(
+                    "INSERT INTO semantic_entries (scope, key, vector, created) VALUES (?, ?, ?, ?)",
+                    (scope, key, sqlite3.Binary(vector.tobytes()), time.time())).lastrowid
+            self._append(scope, vector, key, row_id)
+
+    def discard(self, scope, key):
+        """Drop entries whose response is gone from the exact cache (expired or evicted)"""
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                return
+            keep = [i for i, k in enumerate(entry[1]) if k != key]
+            self._rebuild(scope, keep)
+            if self._db is not None:
+                self._db.execute("DELETE FROM semantic_entries WHERE scope = ? AND key = ?", (scope, key))
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM semantic_entries")
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entry[1]) for entry in self._scopes.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "scopes": len(self._scopes),
+            "threshold": self.threshold,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _load(self):
+        rows = self._db.execute("SELECT id, scope, key, vector FROM semantic_entries ORDER BY id").fetchall()
+        for row_id, scope, key, blob in rows:
+            vector = np.frombuffer(blob, dtype='float32')
+            if vector.size != self.dimension:
+                continue  # written with another embedder; can never match
+            self._append(scope, vector.reshape(1, -1), key, row_id)
+
+    def _append(self, scope, vector, key, row_id):
+        entry = self._scopes.get(scope)
+        if entry is None:
+            import faiss
+            entry = self._scopes[scope] = [faiss.IndexFlatIP(self.dimension), [], []]
+        entry[0].add(vector)
+        entry[1].append(key)
+        entry[2].append(row_id)
+        if self.max_entries and len(entry[1]) > self.max_entries:
+            # Oldest first, a tenth at a time so the index isn't rebuilt on every add
+            drop = len(entry[1]) - self.max_entries + max(1, self.max_entries // 10)
+            dropped = [row for row in entry[2][:drop] if row is not None]
+            self._rebuild(scope, range(drop, len(entry[1])))
+            self.evictions += drop
+            if self._db is not None and dropped:
+                self._db.execute("DELETE FROM semantic_entries WHERE id <= ? AND scope = ?", (dropped[-1], scope))
+
+    def _rebuild(self, scope, keep):
+        import faiss
+        keep = list(keep)
+        old, keys, rows = self._scopes[scope]
+        index = faiss.IndexFlatIP(self.dimension)
+        if keep:
+            # A flat index stores the raw vectors, so they can be copied out instead of re-embedded
+            index.add(old.reconstruct_n(0, old.ntotal)[keep])
+        self._scopes[scope] = [index, [keys[i] for i in keep], [rows[i] for i in keep]]
@@ -0,0 +1,225 @@
+# server.py
+#
+# Multi-session HTTP server: many isolated ConsciousAgent sessions on one asyncio
+# loop, each turn streamed back as Server-Sent Events.
+#
+#   python server.py --port 8765
+#
+#   POST   /sessions                 -> {"session_id": ...}
+#   POST   /sessions/{id}/turns      {"input": "..."} -> text/event-stream of agent events
+#                                    (ends with "complete", or "cancelled" past TURN_DEADLINE)
+#   DELETE /sessions/{id}
+#   GET    /stats                    sessions, queue depth, cache/embedding/limiter stats
+#   GET    /metrics                  Prometheus text for all sessions' turns
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+from agent import MEMORY_DIMENSION, ConsciousAgent
+from embeddings import HashingEmbedder
+from llm_interface import AsyncLLMClient, rate_limiter_stats
+from metrics import MetricsRecorder
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+
+class Session:
+    def __init__(self, agent):
+        self.agent = agent
+        self.busy = False
+        self.turns = 0
+        self.last_used = time.monotonic()
+
+class SessionServer:
+    """Session registry plus the resources every session shares.
+
+    Each session owns its SelfModel and an in-RAM MemoryBank; the response
+    cache (both tiers), upstream connection pool, embedding engine and metrics recorder
+    are shared. Back-pressure: at most max_concurrent turns stream at once,
+    at most max_queued wait for a slot (beyond that requests get 503 +
+    Retry-After), and a session runs one turn at a time (409 otherwise).
+    A slow SSE reader also slows only its own upstream read, since every
+    write waits for the socket to drain.
+    """
+
+    def __init__(self, max_sessions=1000, max_concurrent=64, max_queued=256, idle_timeout=1800,
+                 max_input_chars=8000, client=None, response_cache=None, embedder=None,
+                 metrics_recorder=None, semantic_cache=None):
+        from config import (RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL,
+                            RESPONSE_CACHE_COMPRESS, EMBEDDING_CACHE_SIZE, METRICS_PATH,
+                            METRICS_PROMETHEUS_PATH, LLM_POOL_SIZE, SEMANTIC_CACHE_THRESHOLD,
+                            SEMANTIC_CACHE_MAX_ENTRIES)
+        self.max_sessions = max_sessions
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.idle_timeout = idle_timeout
+        self.max_input_chars = max_input_chars
+
+        self.client = client or AsyncLLMClient(pool_size=max(LLM_POOL_SIZE, max_concurrent))
+        if response_cache is None:
+            response_cache = ResponseCache(RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                                           ttl=RESPONSE_CACHE_TTL, compress=RESPONSE_CACHE_COMPRESS)
+        self.response_cache = response_cache
+        self.embedder = embedder or HashingEmbedder(dimension=MEMORY_DIMENSION, cache_size=EMBEDDING_CACHE_SIZE)
+        if semantic_cache is None and SEMANTIC_CACHE_THRESHOLD > 0:
+            semantic_cache = SemanticCache(embedder=self.embedder, threshold=SEMANTIC_CACHE_THRESHOLD,
+                                           max_entries=SEMANTIC_CACHE_MAX_ENTRIES, path=response_cache.path)
+        self.semantic_cache = semantic_cache
+        self.metrics_recorder = metrics_recorder or MetricsRecorder(METRICS_PATH, METRICS_PROMETHEUS_PATH)
+
+        self.sessions = {}
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = None  # created on the serving loop
+        self._reaper = None
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post("/sessions", self.create_session),
+            web.post("/sessions/{session_id}/turns", self.run_turn),
+            web.delete("/sessions/{session_id}", self.delete_session),
+            web.get("/stats", self.stats),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def create_session(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            return web.json_response({"error": "too many sessions"}, status=503, headers={"Retry-After": "5"})
+        session_id = uuid.uuid4().hex
+        agent = ConsciousAgent(response_cache=self.response_cache, metrics_recorder=self.metrics_recorder,
+                               memory_path="", semantic_cache=self.semantic_cache)
+        self.sessions[session_id] = Session(agent)
+        return web.json_response({"session_id": session_id}, status=201)
+
+    async def delete_session(self, request):
+        session = self.sessions.pop(request.match_info["session_id"], None)
+        if session is None:
+            raise web.HTTPNotFound()
+        session.agent.close()
+        return web.Response(status=204)
+
+    async def run_turn(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound()
+        try:
+            user_input = (await request.json())["input"]
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({"error": "expected a JSON body with an 'input' string"}, status=400)
+        if not isinstance(user_input, str) or not user_input.strip():
+            return web.json_response({"error": "'input' must be a non-empty string"}, status=400)
+        if len(user_input) > self.max_input_chars:
+            return web.json_response({"error": f"input longer than {self.max_input_chars} characters"}, status=413)
+        if session.busy:
+            return web.json_response({"error": "a turn is already running in this session"}, status=409)
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            return web.json_response({"error": "server busy"}, status=503, headers={"Retry-After": "1"})
+
+        session.busy = True
+        session.last_used = time.monotonic()
+        self.waiting += 1
+        try:
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                return await self._stream_turn(request, session, user_input)
+            finally:
+                self.active -= 1
+                self._slots.release()
+        finally:
+            session.busy = False
+            session.turns += 1
+            session.last_used = time.monotonic()
+
+    async def _stream_turn(self, request, session, user_input):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        await asyncio.to_thread(session.agent.perceive, user_input, self.embedder)
+        events = session.agent.generate_all_thoughts_async(user_input, self.client)
+        try:
+            async for event_type, data in events:
+                await response.write(sse_event(event_type, data))
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Client went away: closing the generator below also closes the upstream stream
+            raise
+        except Exception as e:
+            await response.write(sse_event("error", str(e)))
+        finally:
+            await events.aclose()
+        await response.write_eof()
+        return response
+
+    async def stats(self, request):
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "active_turns": self.active,
+            "waiting_turns": self.waiting,
+            "rejected": self.rejected,
+            "cpu_seconds": round(time.process_time(), 3),
+            "response_cache": self.response_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache is not None else None,
+            "embeddings": self.embedder.stats(),
+            "rate_limiters": rate_limiter_stats(),
+            "stream": self.client.stream_stats,
+        })
+
+    async def metrics(self, request):
+        return web.Response(text=self.metrics_recorder.prometheus(), content_type="text/plain")
+
+    async def _start(self, app):
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _cleanup(self, app):
+        self._reaper.cancel()
+        for session in self.sessions.values():
+            session.agent.close()
+        self.sessions.clear()
+        await self.client.close()
+        self.response_cache.close()
+        if self.semantic_cache is not None:
+            self.semantic_cache.close()
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(60, self.idle_timeout))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session_id, session in list(self.sessions.items()):
+                if not session.busy and session.last_used < cutoff:
+                    del self.sessions[session_id]
+                    session.agent.close()
+
+def sse_event(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+def main():
+    from config import (SERVER_HOST, SERVER_PORT, SERVER_MAX_SESSIONS, SERVER_MAX_CONCURRENT_TURNS,
+                        SERVER_MAX_QUEUED_TURNS, SERVER_SESSION_IDLE_TIMEOUT, SERVER_MAX_INPUT_CHARS)
+    parser = argparse.ArgumentParser(description="Serve many Overthinker sessions over HTTP + SSE")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+
+    server = SessionServer(max_sessions=SERVER_MAX_SESSIONS, max_concurrent=SERVER_MAX_CONCURRENT_TURNS,
+                           max_queued=SERVER_MAX_QUEUED_TURNS, idle_timeout=SERVER_SESSION_IDLE_TIMEOUT,
+                           max_input_chars=SERVER_MAX_INPUT_CHARS)
+    print(f"🌐 Overthinker server on http://{args.host}:{args.port}")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# sse.py
+
+import json
+
+try:
+    # Optional faster JSON backend; the decoder works the same without it
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+# Markers for the fast path that slices delta.content out of a compact frame
+# without a full JSON parse
+_DELTA = b'"delta":{'
+_CONTENT = b'"content":"'
+
+class SSEDecoder:
+    """Incremental decoder for an OpenRouter SSE byte stream.
+
+    Feed it raw network reads in any size; frames split across reads are
+    reassembled. feed() returns the delta.content strings completed by the
+    data, in order. Malformed frames are counted, not raised.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self.done = False
+        self.frames = 0
+        self.malformed = 0
+        self.fast_frames = 0
+        self.usage = None  # token usage reported by the provider's final frame, if any
+        self.errors = 0
+        self.error = None  # last mid-stream error object sent by the provider
+
+    def feed(self, data):
+        if self.done:
+            return []
+        buffer = self._buffer + data if self._buffer else data
+
+        # Everything after the last newline is an incomplete line; keep it for the next read
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            self._buffer = buffer
+            return []
+        self._buffer = buffer[end + 1:]
+
+        contents = []
+        for line in buffer[:end].split(b"\n"):
+            if line[:5] != b"data:":
+                continue  # blank separator lines, comments (": OPENROUTER PROCESSING"), other fields
+            content = self._decode_data(line[5:].strip())
+            if content:
+                contents.append(content)
+            elif self.done:
+                self._buffer = b""
+                break
+        return contents
+
+    def close(self):
+        """Flush a final frame that arrived without a trailing newline"""
+        if self._buffer and not self.done:
+            line, self._buffer = self._buffer, b""
+            if line.startswith(b"data:"):
+                # A possibly truncated frame: only trust the full JSON parser here
+                content = self._decode_data(line[5:].strip(), fast=False)
+                return [content] if content else []
+        return []
+
+    def _decode_data(self, payload, fast=True):
+        if payload == b"[DONE]":
+            self.done = True
+            return None
+        self.frames += 1
+
+        # Fast path: a frame whose only content string has no escapes can be
+        # sliced directly. Quotes inside content are always escaped, so finding
+        # '"usage":' or '"error":' means a real key and needs the full parser.
+        delta = payload.find(_DELTA) if fast else -1
+        if delta >= 0:
+            start = payload.find(_CONTENT, delta)
+            if start >= 0:
+                start += len(_CONTENT)
+                end = payload.find(b'"', start)
+                body = payload[start:end]
+                if (end > 0 and b"\\" not in body and payload.find(_CONTENT, end) < 0
+                        and b'"usage":' not in payload and b'"error":' not in payload):
+                    try:
+                        content = body.decode("utf-8")
+                        self.fast_frames += 1
+                        return content or None
+                    except UnicodeDecodeError:
+                        pass
+
+        try:
+            frame = _loads(payload)
+        except ValueError:
+            self.malformed += 1
+            return None
+        if not isinstance(frame, dict):
+            self.malformed += 1
+            return None
+
+        if frame.get("usage"):
+            self.usage = frame["usage"]
+        if frame.get("error"):
+            self.errors += 1
+            self.error = frame["error"]
+            return None
+
+        choices = frame.get("choices")
+        if not choices:
+            return None  # e.g. the usage-only final frame
+        try:
+            return choices[0].get("delta", {}).get("content") or None
+        except AttributeError:
+            self.malformed += 1
+            return None
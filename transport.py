@@ -0,0 +1,251 @@
+# transport.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Headers that describe the wire encoding, which recordings don't keep (bodies are stored decoded)
+WIRE_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+class ReplayMiss(Exception):
+    """No recording matches a request made while replaying"""
+
+class TransportArchive:
+    """Recorded upstream responses in one SQLite file.
+
+    A recording keeps the status, headers and raw body chunks with their
+    original boundaries and arrival times (seconds after the request was
+    sent), keyed by a hash of the request (method, path and body). Bodies are zlib-compressed;
+    chunk sizes and times are packed arrays.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS recordings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                headers_at REAL NOT NULL,
+                sizes BLOB NOT NULL,
+                times BLOB NOT NULL,
+                body BLOB NOT NULL,
+                created REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS recordings_key ON recordings (key)")
+        self._lock = threading.Lock()
+        self._cursors = {}  # key -> index of the next recording to replay
+        self._used = set()
+
+    def save(self, key, url, status, headers, headers_at, chunks):
+        """Store one response; chunks is a list of (seconds after the request, bytes)"""
+        sizes = array("I", (len(data) for _, data in chunks))
+        times = array("d", (at for at, _ in chunks))
+        body = zlib.compress(b"".join(data for _, data in chunks))
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO recordings (key, url, status, headers, headers_at, sizes, times, body, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(headers), headers_at, sizes.tobytes(), times.tobytes(), body,
+                 time.time()))
+
+    def take(self, key, sequence=False):
+        """Next recording for key, in recorded order; the last one repeats once all were replayed.
+
+        With sequence, a key that was never recorded gets the oldest recording
+        not replayed yet instead, for prompts that differ from the recorded run.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT id FROM recordings WHERE key = ? ORDER BY id", (key,))]
+            if ids:
+                index = self._cursors.get(key, 0)
+                self._cursors[key] = index + 1
+                row_id = ids[min(index, len(ids) - 1)]
+            elif sequence:
+                row_id = next((row for row, in self._db.execute("SELECT id FROM recordings ORDER BY id")
+                               if row not in self._used), None)
+            else:
+                row_id = None
+            if row_id is None:
+                return None
+            self._used.add(row_id)
+            status, headers, headers_at, sizes, times, body = self._db.execute(
+                "SELECT status, headers, headers_at, sizes, times, body FROM recordings WHERE id = ?",
+                (row_id,)).fetchone()
+        body = zlib.decompress(body)
+        chunks = []
+        pos = 0
+        for size, at in zip(array("I", sizes), array("d", times)):
+            chunks.append((at, body[pos:pos + size]))
+            pos += size
+        return status, json.loads(headers), headers_at, chunks
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM recordings")
+            self._cursors.clear()
+            self._used.clear()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def request_key(request):
+    """Method, path and body: the same request matches whichever host it was recorded from"""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    target = f"{request.method} {urlsplit(request.url).path}\n".encode("utf-8")
+    return hashlib.sha256(target + body).hexdigest()
+
+class RecordingAdapter(BaseAdapter):
+    """requests adapter that forwards to a real one and records every complete response"""
+
+    def __init__(self, adapter, archive):
+        super().__init__()
+        self.adapter = adapter
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        sent = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        headers_at = time.perf_counter() - sent
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in WIRE_HEADERS}
+
+        def save(chunks):
+            self.archive.save(request_key(request), request.url, response.status_code, headers, headers_at, chunks)
+
+        response.raw = _RecordingBody(response.raw, save, sent)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+class _RecordingBody:
+    """Proxy for a urllib3 response that notes each chunk read; saved once the body was read to the end"""
+
+    def __init__(self, raw, save, sent):
+        self._raw = raw
+        self._save = save
+        self._sent = sent
+        self._chunks = []
+
+    def stream(self, amt=None, decode_content=True):
+        for data in self._raw.stream(amt, decode_content=decode_content):
+            self._chunks.append((time.perf_counter() - self._sent, data))
+            yield data
+        # Cancelled or failed reads never get here: only whole responses are replayable
+        self._save(self._chunks)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+class ReplayAdapter(BaseAdapter):
+    """requests adapter that answers from a TransportArchive instead of the network.
+
+    speed 1 replays at the recorded pace, 2 twice as fast, 0 as fast as possible.
+    """
+
+    def __init__(self, archive, speed=1.0, sequence=False):
+        super().__init__()
+        self.archive = archive
+        self.speed = speed
+        self.sequence = sequence
+
+    def send(self, request, **kwargs):
+        recording = self.archive.take(request_key(request), self.sequence)
+        if recording is None:
+            # A ConnectionError, so the client gives up at once instead of retrying
+            raise requests.exceptions.ConnectionError(ReplayMiss(f"No recording for this request in "
+                                                                 f"{self.archive.path}"), request=request)
+        status, headers, headers_at, chunks = recording
+        sent = time.perf_counter()
+        body = _ReplayBody(chunks, self.speed, sent)
+        body.wait(headers_at)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = body
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+class _ReplaySocket:
+    """What abort_on_cancel shuts down to interrupt a read; here it ends the replayed body"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def shutdown(self, how):
+        self.closed.set()
+
+class _ReplayBody:
+    def __init__(self, chunks, speed, sent):
+        self.chunks = chunks
+        self.speed = speed
+        self.sent = sent
+        self.sock = _ReplaySocket()
+        self.connection = self  # response.raw.connection.sock, like urllib3
+
+    def wait(self, at):
+        """Sleep until `at` recorded seconds after the request; False once aborted"""
+        if self.speed:
+            delay = self.sent + at / self.speed - time.perf_counter()
+            if delay > 0:
+                return not self.sock.closed.wait(delay)
+        return not self.sock.closed.is_set()
+
+    def stream(self, amt=None, decode_content=True):
+        for at, data in self.chunks:
+            if not self.wait(at):
+                return
+            yield data
+
+    def read(self, amt=None, decode_content=True):
+        return b"".join(self.stream())
+
+    def close(self):
+        self.sock.closed.set()
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+def get_archive(path):
+    """One archive per path for the process, shared by every client"""
+    with _archives_lock:
+        if path not in _archives:
+            _archives[path] = TransportArchive(path)
+        return _archives[path]
+
+def transport_adapter(adapter, mode, path, speed=1.0, sequence=False):
+    """Wrap or replace a client's HTTPAdapter for TRANSPORT_MODE ("record" or "replay")"""
+    if mode == "record":
+        return RecordingAdapter(adapter, get_archive(path))
+    if mode == "replay":
+        return ReplayAdapter(get_archive(path), speed, sequence)
+    raise ValueError(f"Unknown TRANSPORT_MODE '{mode}', expected 'record' or 'replay'")